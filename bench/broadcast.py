@@ -0,0 +1,31 @@
+"""Замер пропускной способности рассылки на FakeBot.
+
+Запуск: python -m bench.broadcast --messages 2000 --rate 500 --workers 64
+"""
+import argparse
+import asyncio
+
+from bench.fake_bot import FakeBot
+from bot.broadcast import Broadcaster
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--rate', type=float, default=25.0)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--flood-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    bot = FakeBot(latency=args.latency, flood_rate=args.flood_rate)
+    messages = [(chat_id, f'message {chat_id}') for chat_id in range(args.messages)]
+    stats = await Broadcaster(bot, workers=args.workers, rate=args.rate).run(messages, parse_mode='HTML')
+    print(
+        f'sent={stats.sent}/{stats.total} failed={stats.failed} retried={stats.retried} '
+        f'duration={stats.duration:.2f}s throughput={stats.throughput:.1f} msg/s'
+    )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,26 @@
+"""Микробенчмарк клавиатур календаря: построение с нуля против кэша.
+
+Запуск: python -m bench.calendar_kb
+"""
+import timeit
+
+from bot import calendar as cal
+
+NUMBER = 2000
+
+
+def report(name, uncached, cached):
+    before = timeit.timeit(uncached, number=NUMBER) / NUMBER * 1e6
+    after = timeit.timeit(cached, number=NUMBER) / NUMBER * 1e6
+    print(f'{name:<8} uncached={before:8.1f} us  cached={after:6.2f} us  x{before / after:.0f}')
+
+
+def main():
+    end_year = cal.get_end_year()
+    report('years', lambda: cal._build_years_kb.__wrapped__(2, end_year), lambda: cal.get_years_kb(2))
+    report('months', lambda: cal.get_months_kb.__wrapped__(2000), lambda: cal.get_months_kb(2000))
+    report('days', lambda: cal.get_days_kb.__wrapped__(2000, 2), lambda: cal.get_days_kb(2000, 2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Локальный фейковый сервер Bot API (и Nominatim) для нагрузочных замеров.
+
+Отвечает на любой метод Bot API успешным ответом с задержкой latency; send*/edit* возвращают Message.
+getUpdates отдаёт апдейты из очереди updates, поэтому сервер годится и для long polling.
+"""
+import asyncio
+import time
+from collections import Counter
+
+from aiohttp import web
+
+# Координаты, которые «находит» фейковый Nominatim для любого города (Москва)
+FAKE_LAT, FAKE_LON = '55.7558', '37.6173'
+
+
+class FakeTelegramAPI:
+    def __init__(self, latency: float = 0.0, host: str = '127.0.0.1', port: int = 0):
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.calls = Counter()
+        self.first_call = {}  # метод -> time.perf_counter() первого вызова
+        self.updates = []
+        self._runner = None
+        self._message_id = 0
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    async def _bot_method(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        self.calls[method] += 1
+        self.first_call.setdefault(method, time.perf_counter())
+        data = await request.post()
+        if method == 'getUpdates':
+            if not self.updates:
+                await asyncio.sleep(min(float(data.get('timeout', 0) or 0), 0.5))
+            result, self.updates = self.updates, []
+            return web.json_response({'ok': True, 'result': result})
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method == 'getMe':
+            result = {'id': 123456, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+        elif method.lower().startswith(('send', 'edit')):
+            self._message_id += 1
+            result = {
+                'message_id': self._message_id,
+                'date': int(time.time()),
+                'chat': {'id': int(data.get('chat_id', 0)), 'type': 'private'},
+                'text': data.get('text', ''),
+            }
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+    async def _search(self, request: web.Request) -> web.Response:
+        self.calls['nominatim'] += 1
+        return web.json_response([{'lat': FAKE_LAT, 'lon': FAKE_LON}])
+
+    async def _reverse(self, request: web.Request) -> web.Response:
+        self.calls['nominatim'] += 1
+        return web.json_response({'address': {'city': 'Москва'}})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self._bot_method)
+        app.router.add_get('/search', self._search)
+        app.router.add_get('/reverse', self._reverse)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
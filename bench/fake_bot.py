@@ -0,0 +1,22 @@
+import asyncio
+import random
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+
+class FakeBot:
+    """Заглушка aiogram.Bot для локальных замеров: имитирует задержку API и flood wait."""
+
+    def __init__(self, latency: float = 0.05, flood_rate: float = 0.0, retry_after: int = 1):
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.sent = []
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        await asyncio.sleep(self.latency)
+        if self.flood_rate and random.random() < self.flood_rate:
+            method = SendMessage(chat_id=chat_id, text=text, **kwargs)
+            raise TelegramRetryAfter(method=method, message='Flood control exceeded', retry_after=self.retry_after)
+        self.sent.append((chat_id, text))
@@ -0,0 +1,230 @@
+"""Нагрузочный стенд: апдейты через настоящие Dispatcher/router и суточный прогон рассылки.
+
+updates   — синтетические пользователи проходят /start → календарь → город → подтверждение
+            и команды меню; апдейты идут через dp.feed_update, Bot API и Nominatim — фейковые (bench.fake_api).
+countdown — в users засеваются пользователи по реальным IANA-зонам, затем прогоняются тики планировщика
+            за сутки (claim_due_users) и outbox отправляется через фейковый Bot API.
+
+Работает с БД из SQLALCHEMY_URI (SQLite или MySQL) — используйте отдельную базу: тики планировщика
+затрагивают всех пользователей в ней. Пользователи стенда получают id от BENCH_ID_BASE и удаляются перед прогоном.
+
+Запуск:
+    python -m bench.load updates --users 500 --concurrency 50
+    python -m bench.load countdown --users 100000 --rate 1000
+"""
+import argparse
+import asyncio
+import logging
+import random
+import resource
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+import pytz
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.types import Update
+from sqlalchemy import delete, insert
+
+from bench.fake_api import FakeTelegramAPI
+from bot.broadcast import Broadcaster
+from bot.calendar import CalendarAction, cal
+from bot.db.database import Session, dispose_engine
+from bot.db.migrations import migrate
+from bot.db.outbox.models import OutboxMessage
+from bot.db.users.models import User
+from bot.fsm_storage import create_fsm_storage
+from bot.geo import close_session, warm_up_timezone_finder
+from bot.instrumentation import MetricsMiddleware, TelegramTimingMiddleware
+from bot.metrics import handler_seconds
+from bot.outbox import OutboxSender
+from bot.routes import router
+from bot.scheduler import claim_due_users, get_due_timezones
+from config import settings
+
+BENCH_ID_BASE = 9_000_000_000
+SEED_CHUNK = 10_000
+# Города из справочника и один, которого там нет (уходит в фейковый Nominatim)
+CITIES = ('Москва', 'Новосибирск', 'Владивосток', 'Берлин', 'Алматы', 'Дубай', 'Ванкувер', 'Нижние Пупки')
+MENU_TEXTS = ('Сколько дней до дня рождения?', 'Сколько дней со дня рождения?', 'Мои настройки', '/menu')
+
+
+def peak_rss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values: list, q: int) -> float:
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else (values or [0.0])[0]
+
+
+async def clear_bench_users():
+    async with Session() as session:
+        await session.execute(delete(OutboxMessage).where(OutboxMessage.user_id >= BENCH_ID_BASE))
+        await session.execute(delete(User).where(User.user_id >= BENCH_ID_BASE))
+        await session.commit()
+
+
+def create_bot(api: FakeTelegramAPI) -> Bot:
+    bot = Bot('123456:bench', session=AiohttpSession(api=TelegramAPIServer.from_base(api.base_url)))
+    bot.session.middleware(TelegramTimingMiddleware())
+    return bot
+
+
+class UpdateFactory:
+    def __init__(self):
+        self.update_id = 0
+
+    def _next(self) -> int:
+        self.update_id += 1
+        return self.update_id
+
+    @staticmethod
+    def _user(user_id: int) -> dict:
+        return {'id': user_id, 'is_bot': False, 'first_name': 'Bench'}
+
+    def message(self, user_id: int, text: str) -> Update:
+        update_id = self._next()
+        return Update.model_validate({'update_id': update_id, 'message': {
+            'message_id': update_id, 'date': int(time.time()), 'text': text,
+            'chat': {'id': user_id, 'type': 'private'}, 'from': self._user(user_id),
+        }})
+
+    def callback(self, user_id: int, data: str) -> Update:
+        update_id = self._next()
+        return Update.model_validate({'update_id': update_id, 'callback_query': {
+            'id': str(update_id), 'chat_instance': str(user_id), 'data': data, 'from': self._user(user_id),
+            'message': {
+                'message_id': update_id, 'date': int(time.time()), 'text': '...',
+                'chat': {'id': user_id, 'type': 'private'},
+            },
+        }})
+
+
+async def run_updates(args, api: FakeTelegramAPI):
+    storage, isolation = create_fsm_storage()
+    dp = Dispatcher(storage=storage, events_isolation=isolation)
+    dp.include_router(router)
+    router.message.middleware(MetricsMiddleware())
+    router.callback_query.middleware(MetricsMiddleware())
+    bot = create_bot(api)
+    updates = UpdateFactory()
+    timings = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def feed(update: Update):
+        started = time.perf_counter()
+        await dp.feed_update(bot, update)
+        timings.append(time.perf_counter() - started)
+
+    async def flow(n: int):
+        user_id = BENCH_ID_BASE + n
+        year, month, day = 1970 + n % 40, 1 + n % 12, 1 + n % 28
+        async with semaphore:
+            await feed(updates.message(user_id, '/start'))
+            await feed(updates.callback(user_id, cal(CalendarAction.YEAR, year=year)))
+            await feed(updates.callback(user_id, cal(CalendarAction.MONTH, year=year, month=month)))
+            await feed(updates.callback(user_id, cal(CalendarAction.DAY, year=year, month=month, day=day)))
+            await feed(updates.callback(user_id, cal(CalendarAction.CONFIRM, year=year, month=month, day=day)))
+            await feed(updates.message(user_id, CITIES[n % len(CITIES)]))
+            data = await storage.get_data(StorageKey(bot_id=bot.id, chat_id=user_id, user_id=user_id))
+            await feed(updates.callback(user_id, f'confirm_timezone:{data.get("timezone")}'))
+            for text in MENU_TEXTS:
+                await feed(updates.message(user_id, text))
+
+    await warm_up_timezone_finder()
+    started = time.perf_counter()
+    await asyncio.gather(*(flow(n) for n in range(args.users)))
+    elapsed = time.perf_counter() - started
+    await bot.session.close()
+    await storage.close()
+
+    print(f'updates: {len(timings)} за {elapsed:.2f} с — {len(timings) / elapsed:.0f} upd/s, '
+          f'p50={percentile(timings, 50) * 1000:.1f} мс p99={percentile(timings, 99) * 1000:.1f} мс')
+    for name, histogram in sorted(handler_seconds.items()):
+        print(f'  {name:<32} n={histogram.count:<6} p50≤{histogram.quantile(0.5) * 1000:6.1f} мс '
+              f'p99≤{histogram.quantile(0.99) * 1000:6.1f} мс')
+    print(f'  Bot API: {sum(api.calls.values())} вызовов, Nominatim: {api.calls["nominatim"]}')
+
+
+async def seed_users(count: int):
+    zones = pytz.common_timezones
+    rng = random.Random(42)
+    start = date(1960, 1, 1)
+    for offset in range(0, count, SEED_CHUNK):
+        async with Session() as session:
+            await session.execute(insert(User), [
+                {
+                    'user_id': BENCH_ID_BASE + n,
+                    'birthday': start + timedelta(days=rng.randrange(365 * 50)),
+                    'timezone': rng.choice(zones),
+                    'city': 'Город',
+                    'notifications_enabled': True,
+                }
+                for n in range(offset, min(offset + SEED_CHUNK, count))
+            ])
+            await session.commit()
+
+
+async def run_countdown(args, api: FakeTelegramAPI):
+    started = time.perf_counter()
+    await seed_users(args.users)
+    print(f'seed: {args.users} пользователей за {time.perf_counter() - started:.1f} с')
+
+    # Сутки тиков планировщика: каждая зона попадает в окно после своей локальной полуночи
+    day = datetime.now(pytz.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    enqueued = 0
+    started = time.perf_counter()
+    for minute in range(0, 24 * 60, settings.notify_interval_minutes):
+        for local_date, zones in get_due_timezones(day + timedelta(minutes=minute)).items():
+            async with Session() as session:
+                enqueued += await claim_due_users(session, local_date, zones)
+    print(f'scheduler: {enqueued} уведомлений поставлено за {time.perf_counter() - started:.1f} с, '
+          f'peak RSS {peak_rss_mib():.0f} MiB')
+
+    bot = create_bot(api)
+    sender = OutboxSender(bot)
+    sender.broadcaster = Broadcaster(bot, workers=args.workers, rate=args.rate, chat_interval=0)
+    sent_before = api.calls['sendMessage']
+    started = time.perf_counter()
+    while rows := await sender.claim_batch():
+        await sender.process_batch(rows)
+    elapsed = time.perf_counter() - started
+    sent = api.calls['sendMessage'] - sent_before
+    print(f'broadcast: {sent} сообщений за {elapsed:.1f} с — {sent / elapsed if elapsed else 0:.0f} msg/s')
+    await bot.session.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('scenario', choices=('updates', 'countdown', 'all'))
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.0, help='задержка фейкового Bot API, с')
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--rate', type=float, default=1000.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    api = FakeTelegramAPI(latency=args.latency)
+    await api.start()
+    settings.nominatim_url = api.base_url
+    await migrate()
+    await clear_bench_users()
+    try:
+        if args.scenario in ('updates', 'all'):
+            await run_updates(args, api)
+        if args.scenario in ('countdown', 'all'):
+            await clear_bench_users()
+            await run_countdown(args, api)
+    finally:
+        await api.stop()
+        await close_session()
+        await dispose_engine()
+    print(f'peak RSS: {peak_rss_mib():.0f} MiB')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""Пиковая память тика планировщика в зависимости от числа пользователей (SQLite, tracemalloc).
+
+legacy — прежний путь: все подходящие User целиком в памяти (scalars().all()) плюс словарь текстов;
+paged  — claim_due_users: страницы по scheduler_chunk_size с записью в outbox после каждой.
+
+Запуск: python -m bench.scheduler_memory --users 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import pytz
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from bot.birthdays import days_until_birthday_batch
+from bot.db.database import Base
+from bot.db.outbox.models import OutboxMessage
+from bot.db.users.models import User
+from bot.scheduler import claim_due_users, get_due_timezones
+from config import settings
+
+CHUNK = 50_000
+
+
+def seed(path: str, users: int, zones: tuple):
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine, tables=[User.__table__, OutboxMessage.__table__])
+    rng = random.Random(42)
+    start = date(1960, 1, 1)
+    with engine.begin() as conn:
+        for offset in range(0, users, CHUNK):
+            conn.execute(User.__table__.insert(), [
+                {
+                    'user_id': user_id,
+                    'birthday': start + timedelta(days=rng.randrange(365 * 50)),
+                    'timezone': rng.choice(zones),
+                    'city': 'Город',
+                    'notifications_enabled': True,
+                }
+                for user_id in range(offset, min(offset + CHUNK, users))
+            ])
+    engine.dispose()
+
+
+async def legacy(session, local_date, zones) -> int:
+    users = (await session.execute(select(User).where(User.birthday != None, User.timezone.in_(zones)))).scalars().all()
+    days_left = days_until_birthday_batch([user.birthday for user in users], local_date)
+    payloads = {
+        user.user_id: f'🎉 До вашего дня рождения осталось <b>{days}</b> дней!'
+        for user, days in zip(users, days_left.tolist())
+    }
+    return len(payloads)
+
+
+async def run(path: str, local_date, zones):
+    engine = create_async_engine(f'sqlite+aiosqlite:///{path}')
+    sessionmaker = async_sessionmaker(bind=engine, expire_on_commit=False)
+    results = {}
+    for name, fn in (('legacy', legacy), ('paged', claim_due_users)):
+        async with sessionmaker() as session:
+            tracemalloc.start()
+            started = time.perf_counter()
+            rows = await fn(session, local_date, zones)
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        results[name] = rows, peak, elapsed
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, nargs='+', default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    due = get_due_timezones(datetime(2024, 6, 1, 21, 0, tzinfo=pytz.utc))
+    local_date, zones = next(iter(due.items()))
+    print(f'chunk size {settings.scheduler_chunk_size}, {len(zones)} due zones')
+    for users in args.users:
+        path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        seed(path, users, zones)
+        results = asyncio.run(run(path, local_date, zones))
+        for name, (rows, peak, elapsed) in results.items():
+            print(f'{users:>9} users  {name:<6} rows={rows:<9} peak={peak / 2**20:8.1f} MiB  {elapsed:7.1f} s')
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
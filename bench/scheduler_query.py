@@ -0,0 +1,122 @@
+"""Замер выборки планировщика на засеянной таблице users (SQLite).
+
+Сравнивает старый запрос (целые ORM-объекты, без фильтра по notifications_enabled,
+индекс только по timezone) с постраничным обходом build_due_query поверх покрывающего индекса ix_users_due.
+
+Запуск: python -m bench.scheduler_query --users 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import pytz
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import Session as SyncSession
+
+from bot.db.users.models import User
+from bot.scheduler import build_due_query, get_due_timezones
+
+CHUNK = 50_000
+
+
+def seed(engine, users: int, disabled_share: float):
+    User.__table__.create(engine)
+    for index in list(User.__table__.indexes):
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+    zones = pytz.common_timezones
+    start = date(1960, 1, 1)
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        for offset in range(0, users, CHUNK):
+            conn.execute(User.__table__.insert(), [
+                {
+                    'user_id': user_id,
+                    'birthday': start + timedelta(days=rng.randrange(365 * 50)),
+                    'timezone': rng.choice(zones),
+                    'city': 'Город',
+                    'notifications_enabled': rng.random() >= disabled_share,
+                    'last_notified_date': None,
+                }
+                for user_id in range(offset, min(offset + CHUNK, users))
+            ])
+
+
+def fetch_all(session, query) -> int:
+    return len(session.execute(query).all())
+
+
+def fetch_pages(session, local_date, zones, chunk_size: int) -> int:
+    rows = 0
+    for zone in zones:
+        after_user_id = None
+        while True:
+            page = session.execute(build_due_query(local_date, zone, None, after_user_id, chunk_size)).all()
+            rows += len(page)
+            if len(page) < chunk_size:
+                break
+            after_user_id = page[-1].user_id
+    return rows
+
+
+def measure(engine, fetch, repeat: int):
+    timings, rows = [], 0
+    with SyncSession(engine) as session:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = fetch(session)
+            timings.append(time.perf_counter() - started)
+            session.expunge_all()
+    return rows, statistics.median(timings)
+
+
+def explain(engine, query) -> str:
+    compiled = query.compile(engine, compile_kwargs={'literal_binds': True})
+    with engine.connect() as conn:
+        return '; '.join(row[-1] for row in conn.execute(text(f'EXPLAIN QUERY PLAN {compiled}')))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--disabled-share', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    engine = create_engine(f'sqlite:///{path}')
+    started = time.perf_counter()
+    seed(engine, args.users, args.disabled_share)
+    print(f'seeded {args.users} users in {time.perf_counter() - started:.1f}s ({path})')
+
+    # Окно, в котором полночь наступает в зонах UTC+3
+    due = get_due_timezones(datetime(2024, 6, 1, 21, 0, tzinfo=pytz.utc))
+    local_date, zones = next(iter(due.items()))
+
+    legacy = select(User).where(User.birthday != None, User.timezone != None, User.timezone.in_(zones))
+    page = build_due_query(local_date, zones[0], None, 0, args.chunk_size)
+
+    with engine.begin() as conn:
+        conn.execute(text('CREATE INDEX ix_users_timezone ON users (timezone)'))
+        conn.execute(text('ANALYZE'))
+    rows, seconds = measure(engine, lambda session: fetch_all(session, legacy), args.repeat)
+    print(f'legacy   rows={rows:<7} median={seconds * 1000:8.1f} ms  plan: {explain(engine, legacy)}')
+
+    with engine.begin() as conn:
+        conn.execute(text('DROP INDEX ix_users_timezone'))
+        for index in User.__table__.indexes:
+            index.create(conn)
+        conn.execute(text('ANALYZE'))
+    rows, seconds = measure(engine, lambda session: fetch_pages(session, local_date, zones, args.chunk_size), args.repeat)
+    print(f'paged    rows={rows:<7} median={seconds * 1000:8.1f} ms  plan: {explain(engine, page)}')
+
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
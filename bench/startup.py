@@ -0,0 +1,71 @@
+"""Холодный старт: время импорта main и время до ответа на первый апдейт (time-to-first-update).
+
+Бот запускается отдельным процессом (python main.py) против фейкового Bot API из bench.fake_api;
+первый апдейт — команда меню, которой нужна БД. Сравниваются обычный запуск и FAST_STARTUP.
+
+Запуск: python -m bench.startup --runs 3
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from bench.fake_api import FakeTelegramAPI
+
+ROOT = Path(__file__).resolve().parent.parent
+FIRST_UPDATE = {'update_id': 1, 'message': {
+    'message_id': 1, 'date': 0, 'text': 'Сколько дней до дня рождения?',
+    'chat': {'id': 42, 'type': 'private'}, 'from': {'id': 42, 'is_bot': False, 'first_name': 'Bench'},
+}}
+
+
+def import_time(env: dict) -> float:
+    code = 'import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)'
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+async def time_to_first_update(env: dict, timeout: float) -> float:
+    api = FakeTelegramAPI()
+    api.updates.append(FIRST_UPDATE)
+    await api.start()
+    env = {**env, 'TELEGRAM_API_URL': api.base_url}
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, 'main.py', cwd=ROOT, env=env,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        while 'sendMessage' not in api.first_call:
+            if process.returncode is not None or time.perf_counter() - started > timeout:
+                raise RuntimeError('бот не ответил на первый апдейт')
+            await asyncio.sleep(0.01)
+        return api.first_call['sendMessage'] - started
+    finally:
+        if process.returncode is None:
+            process.terminate()
+        await process.wait()
+        await api.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    args = parser.parse_args()
+
+    base_env = {**os.environ, 'BOT_TOKEN': '123456:bench', 'RUN_MODE': 'polling'}
+    imports = [import_time(base_env) for _ in range(args.runs)]
+    print(f'import main: median {statistics.median(imports):.2f} с (min {min(imports):.2f})')
+    for name, fast in (('default', 'false'), ('fast', 'true')):
+        env = {**base_env, 'FAST_STARTUP': fast}
+        runs = [asyncio.run(time_to_first_update(env, args.timeout)) for _ in range(args.runs)]
+        print(f'{name:<8} time-to-first-update: median {statistics.median(runs):.2f} с (min {min(runs):.2f})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import calendar
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Optional
+
+import pytz
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def birthday_in_year(birthday: date, year: int) -> date:
+    """День рождения в заданном году; 29 февраля в невисокосный год переносится на 28 февраля."""
+    if birthday.month == 2 and birthday.day == 29 and not calendar.isleap(year):
+        return date(year, 2, 28)
+    return birthday.replace(year=year)
+
+
+def local_today(timezone: str, now: Optional[datetime] = None) -> date:
+    """Текущая дата в таймзоне пользователя."""
+    tz = pytz.timezone(timezone)
+    return now.astimezone(tz).date() if now else datetime.now(tz).date()
+
+
+def next_birthday(birthday: date, today: date) -> date:
+    nearest = birthday_in_year(birthday, today.year)
+    if nearest < today:
+        nearest = birthday_in_year(birthday, today.year + 1)
+    return nearest
+
+
+def last_birthday(birthday: date, today: date) -> date:
+    nearest = birthday_in_year(birthday, today.year)
+    if nearest > today:
+        nearest = birthday_in_year(birthday, today.year - 1)
+    return nearest
+
+
+def days_until_birthday(birthday: date, today: date) -> int:
+    """Дней до ближайшего дня рождения (0 — сегодня)."""
+    return (next_birthday(birthday, today) - today).days
+
+
+def days_since_birthday(birthday: date, today: date) -> int:
+    """Дней с последнего дня рождения (0 — сегодня)."""
+    return (today - last_birthday(birthday, today)).days
+
+
+# numpy импортируется внутри пакетных функций: он нужен только планировщику, а не обработчикам апдейтов
+def _birthdays_in_years(month: 'np.ndarray', day: 'np.ndarray', years: 'np.ndarray') -> 'np.ndarray':
+    import numpy as np
+    month_start = years.astype('datetime64[M]') + month
+    first_day = month_start.astype('datetime64[D]')
+    month_length = ((month_start + 1).astype('datetime64[D]') - first_day).astype(np.int64)
+    # День обрезается по длине месяца: 29.02 -> 28.02 в невисокосный год, как в birthday_in_year
+    return first_day + np.minimum(day, month_length - 1)
+
+
+def days_until_birthday_batch(birthdays, today) -> 'np.ndarray':
+    """Векторный days_until_birthday для массива дат рождения.
+
+    today — одна дата или массив дат той же длины.
+    """
+    import numpy as np
+    birthdays = np.asarray(birthdays, dtype='datetime64[D]')
+    today = np.asarray(today, dtype='datetime64[D]')
+    birth_month = birthdays.astype('datetime64[M]')
+    month = birth_month.astype(np.int64) % 12
+    day = (birthdays - birth_month.astype('datetime64[D]')).astype(np.int64)
+
+    years = today.astype('datetime64[Y]')
+    nearest = _birthdays_in_years(month, day, years)
+    nearest = np.where(nearest < today, _birthdays_in_years(month, day, years + 1), nearest)
+    return (nearest - today).astype(np.int64)
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Классы ошибок отправки
+FORBIDDEN = 'forbidden'              # пользователь заблокировал бота
+CHAT_NOT_FOUND = 'chat_not_found'    # чат не существует
+DEACTIVATED = 'deactivated'          # аккаунт пользователя удалён
+TRANSIENT = 'transient'              # сеть, 5xx, flood wait — можно повторить
+OTHER = 'other'                      # прочие ошибки запроса
+PERMANENT_ERRORS = frozenset((FORBIDDEN, CHAT_NOT_FOUND, DEACTIVATED))
+
+
+def classify_send_error(error: Exception) -> str:
+    """Относит ошибку send_message к одному из классов выше."""
+    message = str(error).lower()
+    if isinstance(error, TelegramForbiddenError):
+        return DEACTIVATED if 'deactivated' in message else FORBIDDEN
+    if isinstance(error, TelegramBadRequest):
+        if 'chat not found' in message or 'user not found' in message:
+            return CHAT_NOT_FOUND
+        return OTHER
+    if isinstance(error, (TelegramNetworkError, TelegramServerError, TelegramRetryAfter, OSError, TimeoutError)):
+        return TRANSIENT
+    return OTHER
+
+
+class TokenBucket:
+    """Асинхронный token bucket: не более rate операций в секунду с запасом capacity."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Приостанавливает выдачу токенов (flood wait от Telegram)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+        # Пополнение начинается после паузы, иначе первый acquire засчитает всю паузу и выдаст полный запас
+        self.updated_at = self.paused_until
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+@dataclass
+class BroadcastStats:
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    # Ошибки по чатам (chat_id -> исключение) для повторов и разбора недоставленных сообщений
+    errors: dict = field(default_factory=dict)
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        return self.sent / self.duration if self.duration > 0 else 0.0
+
+
+class Broadcaster:
+    """Рассылка сообщений пулом воркеров с глобальным и per-chat ограничением скорости."""
+
+    def __init__(
+        self,
+        bot: Bot,
+        workers: int = settings.broadcast_workers,
+        rate: float = settings.broadcast_rate,
+        chat_interval: float = settings.broadcast_chat_interval,
+        max_retries: int = settings.broadcast_max_retries,
+    ):
+        self.bot = bot
+        self.workers = workers
+        self.bucket = TokenBucket(rate)
+        self.chat_interval = chat_interval
+        self.max_retries = max_retries
+        self._chat_next_at = {}
+
+    async def _wait_chat(self, chat_id: int):
+        now = time.monotonic()
+        next_at = self._chat_next_at.get(chat_id, 0.0)
+        self._chat_next_at[chat_id] = max(now, next_at) + self.chat_interval
+        if next_at > now:
+            await asyncio.sleep(next_at - now)
+
+    async def _worker(self, queue: asyncio.Queue, stats: BroadcastStats, send_kwargs: dict):
+        while True:
+            item = await queue.get()
+            if item is None:
+                queue.task_done()
+                return
+            chat_id, text, attempt = item
+            try:
+                await self._wait_chat(chat_id)
+                await self.bucket.acquire()
+                await self.bot.send_message(chat_id, text, **send_kwargs)
+                stats.sent += 1
+            except TelegramRetryAfter as e:
+                # Flood wait действует на весь бот: ставим лимитер на паузу и возвращаем сообщение в очередь
+                self.bucket.pause(e.retry_after)
+                if attempt < self.max_retries:
+                    stats.retried += 1
+                    queue.put_nowait((chat_id, text, attempt + 1))
+                else:
+                    stats.failed += 1
+                    stats.errors[chat_id] = e
+                    logger.error(f'Превышено число повторов для user_id={chat_id}')
+            except Exception as e:
+                stats.failed += 1
+                stats.errors[chat_id] = e
+                logger.error(f'Ошибка при отправке уведомления user_id={chat_id}: {e}')
+            finally:
+                queue.task_done()
+
+    async def run(self, messages: Iterable[tuple], **send_kwargs) -> BroadcastStats:
+        """Отправляет пары (chat_id, text) и возвращает статистику рассылки."""
+        stats = BroadcastStats()
+        queue = asyncio.Queue()
+        for chat_id, text in messages:
+            queue.put_nowait((chat_id, text, 0))
+            stats.total += 1
+
+        workers = [
+            asyncio.create_task(self._worker(queue, stats, send_kwargs))
+            for _ in range(min(self.workers, stats.total))
+        ]
+        await queue.join()
+        for _ in workers:
+            queue.put_nowait(None)
+        await asyncio.gather(*workers)
+
+        stats.finished_at = time.monotonic()
+        # Broadcaster может использоваться несколькими рассылками сразу, поэтому удаляются только устаревшие паузы
+        now = time.monotonic()
+        self._chat_next_at = {chat_id: at for chat_id, at in self._chat_next_at.items() if at > now}
+        return stats
@@ -1,11 +1,13 @@
+from aiogram.filters.callback_data import CallbackData
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from datetime import datetime
+from enum import Enum
+from functools import lru_cache
 import calendar
 
 YEARS_PER_PAGE = 5 * 4
 START_YEAR = 1950
-END_YEAR = datetime.now().year + 1
 
 MONTHS = [
     'январь', 'февраль', 'март', 'апрель',
@@ -13,58 +15,134 @@ MONTHS = [
     'сентябрь', 'октябрь', 'ноябрь', 'декабрь'
 ]
 
+# Клавиатуры зависят только от аргументов, поэтому строятся один раз и переиспользуются.
+# Размер кэшей покрывает все годы с START_YEAR (и все месяцы этих лет) с запасом.
+DAYS_CACHE_SIZE = 12 * 128
+
+
+class CalendarAction(str, Enum):
+    YEAR = 'y'            # выбран год
+    MONTH = 'm'           # выбран месяц
+    DAY = 'd'             # выбран день
+    CONFIRM = 'c'         # дата подтверждена
+    CHANGE = 'x'          # выбрать дату заново
+    PREV_YEARS = 'p'      # предыдущая страница годов
+    NEXT_YEARS = 'n'      # следующая страница годов
+    BACK_TO_YEARS = 'Y'   # назад к годам
+    BACK_TO_MONTHS = 'M'  # назад к месяцам
+    NOOP = '_'            # пустая кнопка-заполнитель
+
+
+class CalendarCallback(CallbackData, prefix='cal'):
+    """Данные кнопок календаря: cal:<действие>:<год>:<месяц>:<день>:<страница> (до ~20 байт из 64)."""
+    action: CalendarAction
+    year: int = 0
+    month: int = 0
+    day: int = 0
+    page: int = 0
+
+
+def cal(action: CalendarAction, **fields) -> str:
+    return CalendarCallback(action=action, **fields).pack()
+
+
+NOOP_BUTTON = InlineKeyboardButton(text=' ', callback_data=cal(CalendarAction.NOOP))
+
+
+def get_end_year() -> int:
+    """Год (не включительно), до которого показывается календарь; меняется в Новый год."""
+    return datetime.now().year + 1
+
+
+def get_max_page(end_year: int) -> int:
+    return (end_year - START_YEAR - 1) // YEARS_PER_PAGE
+
+
 def get_years_kb(page: int = 0):
+    end_year = get_end_year()
+    page = max(0, min(page, get_max_page(end_year)))
+    return _build_years_kb(page, end_year)
+
+
+@lru_cache(maxsize=64)
+def _build_years_kb(page: int, end_year: int):
     builder = InlineKeyboardBuilder()
-    max_page = (END_YEAR - START_YEAR - 1) // YEARS_PER_PAGE
-    page = max(0, min(page, max_page))
+    max_page = get_max_page(end_year)
     start = START_YEAR + page * YEARS_PER_PAGE
-    years = [y for y in range(start, min(start + YEARS_PER_PAGE, END_YEAR))]
+    years = [y for y in range(start, min(start + YEARS_PER_PAGE, end_year))]
     if years:
         for i in range(0, len(years), 5):
-            row = [InlineKeyboardButton(text=str(y), callback_data=f"cal:year:{y}:{page}") for y in years[i:i+5]]
+            row = [
+                InlineKeyboardButton(text=str(y), callback_data=cal(CalendarAction.YEAR, year=y, page=page))
+                for y in years[i:i+5]
+            ]
             builder.row(*row)
     nav = []
     if page > 0:
-        nav.append(InlineKeyboardButton(text='←', callback_data=f'cal:year_prev:{page}'))
+        nav.append(InlineKeyboardButton(text='←', callback_data=cal(CalendarAction.PREV_YEARS, page=page)))
     else:
-        nav.append(InlineKeyboardButton(text=' ', callback_data='noop'))
+        nav.append(NOOP_BUTTON)
     if page < max_page:
-        nav.append(InlineKeyboardButton(text='→', callback_data=f'cal:year_next:{page}'))
+        nav.append(InlineKeyboardButton(text='→', callback_data=cal(CalendarAction.NEXT_YEARS, page=page)))
     else:
-        nav.append(InlineKeyboardButton(text=' ', callback_data='noop'))
+        nav.append(NOOP_BUTTON)
     builder.row(*nav)
     return builder.as_markup()
 
+
+@lru_cache(maxsize=128)
 def get_months_kb(year: int):
     builder = InlineKeyboardBuilder()
     for i in range(0, 12, 3):
-        row = [InlineKeyboardButton(text=MONTHS[j], callback_data=f"cal:month:{year}:{j+1}") for j in range(i, i+3)]
+        row = [
+            InlineKeyboardButton(text=MONTHS[j], callback_data=cal(CalendarAction.MONTH, year=year, month=j+1))
+            for j in range(i, i+3)
+        ]
         builder.row(*row)
+    back = cal(CalendarAction.BACK_TO_YEARS, year=year)
     builder.row(
-        InlineKeyboardButton(text='←', callback_data=f'cal:back_to_years'),
-        InlineKeyboardButton(text=str(year), callback_data='cal:back_to_years'),
-        InlineKeyboardButton(text=' ', callback_data='noop')
+        InlineKeyboardButton(text='←', callback_data=back),
+        InlineKeyboardButton(text=str(year), callback_data=back),
+        NOOP_BUTTON
     )
     return builder.as_markup()
 
+
+@lru_cache(maxsize=DAYS_CACHE_SIZE)
 def get_days_kb(year: int, month: int):
     builder = InlineKeyboardBuilder()
     num_days = calendar.monthrange(year, month)[1]
     days = list(range(1, num_days+1))
     for i in range(0, num_days, 7):
-        row = [InlineKeyboardButton(text=str(d), callback_data=f"cal:day:{year}:{month}:{d}") for d in days[i:i+7]]
+        row = [
+            InlineKeyboardButton(text=str(d), callback_data=cal(CalendarAction.DAY, year=year, month=month, day=d))
+            for d in days[i:i+7]
+        ]
         builder.row(*row)
+    back = cal(CalendarAction.BACK_TO_MONTHS, year=year)
     builder.row(
-        InlineKeyboardButton(text='←', callback_data=f'cal:back_to_months:{year}'),
-        InlineKeyboardButton(text=f'{year}, {MONTHS[month-1][:3]}.', callback_data=f'cal:back_to_months:{year}'),
-        InlineKeyboardButton(text=' ', callback_data='noop')
+        InlineKeyboardButton(text='←', callback_data=back),
+        InlineKeyboardButton(text=f'{year}, {MONTHS[month-1][:3]}.', callback_data=back),
+        NOOP_BUTTON
     )
     return builder.as_markup()
 
-def get_confirm_kb(date_str: str):
+
+@lru_cache(maxsize=DAYS_CACHE_SIZE)
+def get_confirm_kb(year: int, month: int, day: int):
     return InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text='Подтвердить', callback_data=f'cal:confirm:{date_str}'),
-             InlineKeyboardButton(text='Изменить', callback_data='cal:change')]
+            [InlineKeyboardButton(text='Подтвердить', callback_data=cal(CalendarAction.CONFIRM, year=year, month=month, day=day)),
+             InlineKeyboardButton(text='Изменить', callback_data=cal(CalendarAction.CHANGE))]
         ]
-    ) 
\ No newline at end of file
+    )
+
+
+def warm_up():
+    """Заранее строит все страницы годов для текущего года окончания календаря."""
+    end_year = get_end_year()
+    for page in range(get_max_page(end_year) + 1):
+        _build_years_kb(page, end_year)
+
+
+warm_up()
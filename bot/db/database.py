@@ -1,20 +1,106 @@
+import time
+
+from sqlalchemy import event
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
+from bot.metrics import add_time, db_query_seconds
 from config import settings
 
 
 Base = declarative_base()
-engine = create_async_engine(settings.sqlalchemy_uri, echo=True)
-Session = async_sessionmaker(bind=engine, expire_on_commit=False)
 
 
-async def create_db():
-    async with engine.connect() as conn:
-        # await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all)
+def create_engine():
+    """Движок с параметрами пула из config.Settings."""
+    kwargs = {
+        'echo': settings.db_echo,
+        'pool_pre_ping': settings.db_pool_pre_ping,
+        'pool_recycle': settings.db_pool_recycle,
+    }
+    if not settings.sqlalchemy_uri.startswith('sqlite'):
+        kwargs.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+        )
+    engine = create_async_engine(settings.sqlalchemy_uri, **kwargs)
+    if settings.db_statement_timeout_ms:
+        event.listen(engine.sync_engine, 'connect', _set_statement_timeout)
+    if settings.db_query_timing:
+        event.listen(engine.sync_engine, 'before_cursor_execute', _before_execute)
+        event.listen(engine.sync_engine, 'after_cursor_execute', _after_execute)
+    return engine
+
+
+def _set_statement_timeout(dbapi_connection, connection_record):
+    timeout = settings.db_statement_timeout_ms
+    dialect = settings.sqlalchemy_uri.split(':', 1)[0].split('+', 1)[0]
+    if dialect == 'mysql':
+        sql = f'SET SESSION max_execution_time = {int(timeout)}'
+    elif dialect == 'postgresql':
+        sql = f'SET statement_timeout = {int(timeout)}'
+    else:
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute(sql)
+    cursor.close()
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started_at'] = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_started_at', None)
+    if started is None:
+        return
+    kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+    elapsed = time.perf_counter() - started
+    db_query_seconds[kind].observe(elapsed)
+    add_time('db', elapsed)
+
+
+def get_insert(dialect_name: str):
+    """Диалектный insert() с поддержкой upsert (ON DUPLICATE KEY / ON CONFLICT)."""
+    if dialect_name == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+    elif dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f'Upsert не поддерживается для диалекта {dialect_name}')
+    return insert
+
+
+class LazySessionMaker(async_sessionmaker):
+    """async_sessionmaker, который создаёт движок при открытии первой сессии."""
+
+    def __call__(self, **local_kw):
+        get_engine()
+        return super().__call__(**local_kw)
+
+
+Session = LazySessionMaker(expire_on_commit=False)
+_engine = None
+
+
+def get_engine():
+    """Движок создаётся при первом обращении: импорт модуля не загружает драйвер БД и не трогает пул."""
+    global _engine
+    if _engine is None:
+        _engine = create_engine()
+        Session.configure(bind=_engine)
+    return _engine
+
+
+async def dispose_engine():
+    """Закрывает соединения пула (например, перед fork/spawn воркеров или при остановке)."""
+    if _engine is not None:
+        await _engine.dispose()
 
 
 async def get_db():
     async with Session() as session:
-        yield session
\ No newline at end of file
+        yield session
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, Text, DateTime
+from bot.db.database import Base
+
+
+class FSMRecord(Base):
+    __tablename__ = "fsm_states"
+
+    key = Column(String(255), primary_key=True)                 # ключ FSM (бот, чат, пользователь)
+    state = Column(String(255), nullable=True)                  # текущее состояние
+    data = Column(Text, nullable=True)                          # данные FSM в компактном JSON
+    expires_at = Column(DateTime, nullable=False, index=True)   # после этого момента запись считается брошенной
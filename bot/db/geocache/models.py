@@ -0,0 +1,13 @@
+from datetime import datetime
+
+from sqlalchemy import Column, String, DateTime
+from bot.db.database import Base
+
+
+class GeoCacheEntry(Base):
+    __tablename__ = "geocache"
+
+    key = Column(String(255), primary_key=True)                 # нормализованный ключ (город или ячейка координат)
+    city = Column(String(100), nullable=True)                   # город
+    timezone = Column(String(100), nullable=False)              # строка с таймзоной
+    updated_at = Column(DateTime, default=datetime.utcnow)      # время записи
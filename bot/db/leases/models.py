@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from bot.db.database import Base
+
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+
+    partition = Column(Integer, primary_key=True, autoincrement=False)  # номер партиции (user_id % N)
+    owner = Column(String(255), nullable=True)                          # инстанс, владеющий партицией
+    expires_at = Column(DateTime, nullable=True)                        # до какого момента действует аренда
+
+
+class SchedulerInstance(Base):
+    __tablename__ = "scheduler_instances"
+
+    owner = Column(String(255), primary_key=True)               # идентификатор инстанса
+    expires_at = Column(DateTime, nullable=False)               # инстанс считается живым до этого момента
@@ -0,0 +1,225 @@
+"""Версионированные миграции схемы БД.
+
+Каждая миграция идемпотентна: перед изменением она сверяется с фактической схемой через inspector,
+поэтому её можно применить и к базе, созданной старым create_db() или вручную.
+
+Запуск: python -m bot.db.migrations [upgrade|status]
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from typing import Callable, NamedTuple
+
+from sqlalchemy import (
+    BigInteger, Boolean, Column, Date, DateTime, Index, Integer, MetaData, String, Table, Text, UniqueConstraint,
+    inspect, select, text, update,
+)
+
+from bot.db.database import dispose_engine, get_engine, get_insert
+from bot.db.schema.models import SchemaVersion
+
+logger = logging.getLogger(__name__)
+
+
+# Таблицы в том виде, в каком их создаёт миграция 1. Модели в bot/db/*/models.py описывают актуальную схему
+# и меняются вместе с новыми миграциями; здесь определения заморожены, иначе правка модели незаметно
+# изменила бы результат миграции 1 на новой базе.
+v1 = MetaData()
+
+v1_users = Table(
+    'users', v1,
+    Column('user_id', BigInteger, primary_key=True),
+    Column('birthday', Date, nullable=True),
+    Column('timezone', String(100), nullable=True),
+    Column('city', String(100), nullable=True),
+    Column('notifications_enabled', Boolean),
+    Column('last_notified_date', Date, nullable=True),
+)
+
+Table(
+    'geocache', v1,
+    Column('key', String(255), primary_key=True),
+    Column('city', String(100), nullable=True),
+    Column('timezone', String(100), nullable=False),
+    Column('updated_at', DateTime),
+)
+
+Table(
+    'fsm_states', v1,
+    Column('key', String(255), primary_key=True),
+    Column('state', String(255), nullable=True),
+    Column('data', Text, nullable=True),
+    Column('expires_at', DateTime, nullable=False, index=True),
+)
+
+Table(
+    'scheduler_leases', v1,
+    Column('partition', Integer, primary_key=True, autoincrement=False),
+    Column('owner', String(255), nullable=True),
+    Column('expires_at', DateTime, nullable=True),
+)
+
+Table(
+    'scheduler_instances', v1,
+    Column('owner', String(255), primary_key=True),
+    Column('expires_at', DateTime, nullable=False),
+)
+
+Table(
+    'outbox', v1,
+    Column('id', BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True),
+    Column('user_id', BigInteger, nullable=False),
+    Column('local_date', Date, nullable=False),
+    Column('payload', Text, nullable=False),
+    Column('status', String(16), nullable=False),
+    Column('attempts', Integer, nullable=False),
+    Column('next_attempt_at', DateTime, nullable=False),
+    Column('last_error', String(255), nullable=True),
+    Column('created_at', DateTime),
+    Column('sent_at', DateTime, nullable=True, index=True),
+    UniqueConstraint('user_id', 'local_date', name='uq_outbox_user_date'),
+    Index('ix_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    upgrade: Callable  # принимает синхронный Connection
+
+
+def add_column(conn, table: str, column: Column):
+    """ALTER TABLE ... ADD COLUMN, если колонки ещё нет."""
+    if column.name in {c['name'] for c in inspect(conn).get_columns(table)}:
+        return
+    quote = conn.dialect.identifier_preparer.quote
+    conn.execute(text(
+        f'ALTER TABLE {quote(table)} ADD COLUMN {quote(column.name)} {column.type.compile(conn.dialect)}'
+    ))
+
+
+def create_index(conn, table: str, name: str, columns: tuple):
+    """CREATE INDEX, если индекса с таким именем ещё нет.
+
+    Колонки перечисляются явно, а не берутся из модели: миграция фиксирует схему на момент своего написания.
+    """
+    if name in {i['name'] for i in inspect(conn).get_indexes(table)}:
+        return
+    quote = conn.dialect.identifier_preparer.quote
+    conn.execute(text(f'CREATE INDEX {quote(name)} ON {quote(table)} ({", ".join(map(quote, columns))})'))
+
+
+def drop_index(conn, table: str, name: str):
+    """DROP INDEX, если индекс существует."""
+    if name not in {i['name'] for i in inspect(conn).get_indexes(table)}:
+        return
+    quote = conn.dialect.identifier_preparer.quote
+    if conn.dialect.name == 'mysql':
+        conn.execute(text(f'DROP INDEX {quote(name)} ON {quote(table)}'))
+    else:
+        conn.execute(text(f'DROP INDEX {quote(name)}'))
+
+
+def create_tables(conn):
+    # Создаются только отсутствующие таблицы; существующие (например, users из create_db) не трогаются
+    v1.create_all(conn)
+
+
+def add_last_notified_date(conn):
+    add_column(conn, 'users', Column('last_notified_date', Date, nullable=True))
+
+
+def backfill_notifications_enabled(conn):
+    # Выборка планировщика фильтрует по notifications_enabled = TRUE, NULL из старых строк её не проходит
+    conn.execute(
+        update(v1_users).where(v1_users.c.notifications_enabled == None).values(notifications_enabled=True)
+    )
+
+
+def add_notify_index(conn):
+    create_index(conn, 'users', 'ix_users_notify', (
+        'notifications_enabled', 'timezone', 'last_notified_date', 'birthday', 'user_id',
+    ))
+
+
+def drop_redundant_user_indexes(conn):
+    # Индекс по первичному ключу дублирует сам ключ, а по timezone — покрывается ix_users_notify
+    drop_index(conn, 'users', 'ix_users_user_id')
+    drop_index(conn, 'users', 'ix_users_timezone')
+
+
+def replace_notify_index(conn):
+    # user_id сразу после timezone: постраничный обход зоны по user_id идёт по индексу без сортировки
+    create_index(conn, 'users', 'ix_users_due', (
+        'notifications_enabled', 'timezone', 'user_id', 'last_notified_date', 'birthday',
+    ))
+    drop_index(conn, 'users', 'ix_users_notify')
+
+
+MIGRATIONS = (
+    Migration(1, 'create tables', create_tables),
+    Migration(2, 'users.last_notified_date', add_last_notified_date),
+    Migration(3, 'backfill users.notifications_enabled', backfill_notifications_enabled),
+    Migration(4, 'index ix_users_notify', add_notify_index),
+    Migration(5, 'drop redundant users indexes', drop_redundant_user_indexes),
+    Migration(6, 'index ix_users_due for keyset pagination', replace_notify_index),
+)
+
+
+async def get_applied() -> dict:
+    """Номер миграции -> время применения."""
+    async with get_engine().begin() as conn:
+        await conn.run_sync(SchemaVersion.__table__.create, checkfirst=True)
+        result = await conn.execute(select(SchemaVersion.version, SchemaVersion.applied_at))
+        return dict(result.all())
+
+
+async def migrate() -> list:
+    """Применяет недостающие миграции по порядку; возвращает номера применённых."""
+    applied = await get_applied()
+    done = []
+    for migration in MIGRATIONS:
+        if migration.version in applied:
+            continue
+        async with get_engine().begin() as conn:
+            await conn.run_sync(migration.upgrade)
+            insert = get_insert(conn.dialect.name)
+            stmt = insert(SchemaVersion).values(
+                version=migration.version, name=migration.name, applied_at=datetime.utcnow()
+            )
+            # Параллельно стартовавший экземпляр мог уже записать эту версию
+            if conn.dialect.name == 'mysql':
+                stmt = stmt.prefix_with('IGNORE')
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=[SchemaVersion.version])
+            await conn.execute(stmt)
+        logger.info(f'Применена миграция {migration.version}: {migration.name}')
+        done.append(migration.version)
+    return done
+
+
+async def status():
+    applied = await get_applied()
+    for migration in MIGRATIONS:
+        state = f'applied {applied[migration.version]:%Y-%m-%d %H:%M}' if migration.version in applied else 'pending'
+        print(f'{migration.version:>4}  {migration.name:<40} {state}')
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Миграции схемы БД')
+    parser.add_argument('command', nargs='?', choices=('upgrade', 'status'), default='upgrade')
+    args = parser.parse_args()
+    try:
+        if args.command == 'status':
+            await status()
+        else:
+            done = await migrate()
+            print(f'Применено миграций: {len(done)}')
+    finally:
+        await dispose_engine()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
+    asyncio.run(main())
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from sqlalchemy import Column, BigInteger, Integer, String, Text, Date, DateTime, Index, UniqueConstraint
+from bot.db.database import Base
+
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox"
+    __table_args__ = (
+        UniqueConstraint('user_id', 'local_date', name='uq_outbox_user_date'),  # одно уведомление в день
+        Index('ix_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, nullable=False)                # Telegram ID получателя
+    local_date = Column(Date, nullable=False)                   # локальная дата уведомления
+    payload = Column(Text, nullable=False)                      # текст сообщения
+    status = Column(String(16), nullable=False, default='pending')  # pending / sending / sent / dead
+    attempts = Column(Integer, nullable=False, default=0)       # число неудачных попыток
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # когда можно (повторно) взять в работу
+    last_error = Column(String(255), nullable=True)             # последняя ошибка отправки
+    created_at = Column(DateTime, default=datetime.utcnow)      # время постановки в очередь
+    sent_at = Column(DateTime, nullable=True, index=True)       # время доставки
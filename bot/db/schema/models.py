@@ -0,0 +1,12 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime
+from bot.db.database import Base
+
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)  # номер миграции
+    name = Column(String(100), nullable=False)                  # краткое описание
+    applied_at = Column(DateTime, default=datetime.utcnow)      # время применения
@@ -0,0 +1,139 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from datetime import date
+from typing import Optional
+
+from bot.db.database import Session
+from bot.db.users.models import User
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Признак отсутствия записи в кэше (None в кэше означает «пользователя нет в БД»)
+MISS = object()
+
+
+@dataclass(frozen=True)
+class UserProfile:
+    user_id: int
+    birthday: Optional[date]
+    timezone: Optional[str]
+    city: Optional[str]
+    notifications_enabled: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> 'UserProfile':
+        return cls(
+            user_id=user.user_id,
+            birthday=user.birthday,
+            timezone=user.timezone,
+            city=user.city,
+            notifications_enabled=bool(user.notifications_enabled),
+        )
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        data['birthday'] = self.birthday.isoformat() if self.birthday else None
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, raw: str) -> 'UserProfile':
+        data = json.loads(raw)
+        data['birthday'] = date.fromisoformat(data['birthday']) if data['birthday'] else None
+        return cls(**data)
+
+
+class MemoryProfileBackend:
+    """Кэш профилей в памяти процесса: LRU с ограничением размера и TTL."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+
+    async def get(self, user_id: int):
+        item = self.data.get(user_id)
+        if item is None:
+            return MISS
+        expires_at, profile = item
+        if expires_at < time.monotonic():
+            del self.data[user_id]
+            return MISS
+        self.data.move_to_end(user_id)
+        return profile
+
+    async def set(self, user_id: int, profile: Optional[UserProfile]):
+        self.data[user_id] = (time.monotonic() + self.ttl, profile)
+        self.data.move_to_end(user_id)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    async def delete(self, user_id: int):
+        self.data.pop(user_id, None)
+
+
+class RedisProfileBackend:
+    """Общий для нескольких процессов кэш в Redis (или совместимом хранилище)."""
+
+    def __init__(self, url: str, ttl: int, prefix: str = 'user_profile:'):
+        from redis.asyncio import Redis
+
+        self.redis = Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, user_id: int):
+        raw = await self.redis.get(f'{self.prefix}{user_id}')
+        if raw is None:
+            return MISS
+        if raw == b'null':
+            return None
+        return UserProfile.from_json(raw)
+
+    async def set(self, user_id: int, profile: Optional[UserProfile]):
+        raw = profile.to_json() if profile else 'null'
+        await self.redis.set(f'{self.prefix}{user_id}', raw, ex=self.ttl)
+
+    async def delete(self, user_id: int):
+        await self.redis.delete(f'{self.prefix}{user_id}')
+
+
+def create_backend():
+    if settings.user_cache_backend == 'redis':
+        return RedisProfileBackend(settings.redis_url, settings.user_cache_ttl)
+    return MemoryProfileBackend(settings.user_cache_size, settings.user_cache_ttl)
+
+
+backend = create_backend()
+
+
+async def get_profile(user_id: int) -> Optional[UserProfile]:
+    """Профиль пользователя из кэша; при промахе читается из БД и кэшируется (в том числе отсутствие)."""
+    try:
+        cached = await backend.get(user_id)
+    except Exception as e:
+        logger.error(f'Ошибка чтения кэша профилей: {e}')
+        cached = MISS
+    if cached is not MISS:
+        return cached
+
+    async with Session() as session:
+        user = await session.get(User, user_id)
+        profile = UserProfile.from_user(user) if user else None
+
+    try:
+        await backend.set(user_id, profile)
+    except Exception as e:
+        logger.error(f'Ошибка записи кэша профилей: {e}')
+    return profile
+
+
+async def invalidate_profile(user_id: int):
+    """Сбрасывает профиль после любой записи в users."""
+    try:
+        await backend.delete(user_id)
+    except Exception as e:
+        logger.error(f'Ошибка сброса кэша профилей user_id={user_id}: {e}')
@@ -1,12 +1,17 @@
-from sqlalchemy import Column, BigInteger, String, Date, Boolean
+from sqlalchemy import Column, BigInteger, String, Date, Boolean, Index
 from bot.db.database import Base
 
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Покрывающий индекс для выборки планировщика: флаг + зона, внутри зоны — по порядку user_id
+        Index('ix_users_due', 'notifications_enabled', 'timezone', 'user_id', 'last_notified_date', 'birthday'),
+    )
 
-    user_id = Column(BigInteger, primary_key=True, index=True)  # Telegram ID
+    user_id = Column(BigInteger, primary_key=True)              # Telegram ID
     birthday = Column(Date, nullable=True)                      # дата рождения
     timezone = Column(String(100), nullable=True)               # строка с таймзоной
     city = Column(String(100), nullable=True)                   # город
     notifications_enabled = Column(Boolean, default=True)       # включены ли уведомления
+    last_notified_date = Column(Date, nullable=True)            # локальная дата последнего уведомления
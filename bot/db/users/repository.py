@@ -0,0 +1,54 @@
+from sqlalchemy import delete, update
+
+from bot.db.database import Session, get_insert
+from bot.db.users.cache import get_profile, invalidate_profile
+from bot.db.users.models import User
+
+__all__ = ['get_profile', 'upsert_user', 'delete_user', 'disable_notifications']
+
+
+def build_upsert(dialect_name: str, user_id: int, **values):
+    """INSERT ... ON DUPLICATE KEY UPDATE (MySQL) или ON CONFLICT DO UPDATE (SQLite/PostgreSQL).
+
+    Новая запись создаётся с включёнными уведомлениями; у существующей меняются только values.
+    """
+    insert = get_insert(dialect_name)
+    stmt = insert(User).values(user_id=user_id, **{'notifications_enabled': True, **values})
+    if dialect_name == 'mysql':
+        return stmt.on_duplicate_key_update(**values)
+    return stmt.on_conflict_do_update(index_elements=[User.user_id], set_=values)
+
+
+async def upsert_user(user_id: int, **values):
+    """Создаёт или обновляет пользователя одним запросом и сбрасывает его профиль в кэше."""
+    async with Session() as session:
+        await session.execute(build_upsert(session.bind.dialect.name, user_id, **values))
+        await session.commit()
+    await invalidate_profile(user_id)
+
+
+async def delete_user(user_id: int) -> bool:
+    """Удаляет пользователя; возвращает False, если его не было."""
+    async with Session() as session:
+        result = await session.execute(delete(User).where(User.user_id == user_id))
+        await session.commit()
+    await invalidate_profile(user_id)
+    return result.rowcount > 0
+
+
+async def disable_notifications(user_ids: list, batch_size: int = 1000) -> int:
+    """Массово выключает уведомления (например, заблокировавшим бота); возвращает число строк."""
+    updated = 0
+    async with Session() as session:
+        for i in range(0, len(user_ids), batch_size):
+            result = await session.execute(
+                update(User)
+                .where(User.user_id.in_(user_ids[i:i + batch_size]), User.notifications_enabled == True)
+                .values(notifications_enabled=False)
+                .execution_options(synchronize_session=False)
+            )
+            updated += result.rowcount
+        await session.commit()
+    for user_id in user_ids:
+        await invalidate_profile(user_id)
+    return updated
@@ -0,0 +1,157 @@
+import json
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Any, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage, DefaultKeyBuilder, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage, SimpleEventIsolation
+from sqlalchemy import delete
+
+from bot.db.database import Session, get_insert
+from bot.db.fsm.models import FSMRecord
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Записи FSM, прочитанные/изменённые в рамках текущего апдейта: key -> [state, data, dirty]
+_batch: ContextVar[Optional[dict]] = ContextVar('fsm_batch', default=None)
+
+
+def _dumps(data: Mapping[str, Any]) -> Optional[str]:
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False) if data else None
+
+
+class SQLAlchemyStorage(BaseStorage):
+    """FSM-хранилище в таблице fsm_states через общий движок SQLAlchemy.
+
+    Состояние и данные лежат в одной строке. Внутри апдейта (см. BatchingEventIsolation)
+    строка читается один раз, а все изменения записываются одним upsert в конце обработки.
+    Переживает перезапуск, но рассчитано на один процесс: апдейты одного пользователя, попавшие
+    в разные процессы, перезапишут друг друга. Для нескольких воркеров вебхука — fsm_storage=redis.
+    """
+
+    def __init__(self, ttl: timedelta):
+        self.ttl = ttl
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+
+    async def _load(self, key: str) -> list:
+        batch = _batch.get()
+        if batch is not None and key in batch:
+            return batch[key]
+        async with Session() as session:
+            record = await session.get(FSMRecord, key)
+        if record is None or record.expires_at < datetime.utcnow():
+            entry = [None, {}, False]
+        else:
+            entry = [record.state, json.loads(record.data) if record.data else {}, False]
+        if batch is not None:
+            batch[key] = entry
+        return entry
+
+    async def _store(self, key: str, entry: list):
+        batch = _batch.get()
+        if batch is not None:
+            entry[2] = True
+            batch[key] = entry
+            return
+        await self.flush(key, entry)
+
+    async def flush(self, key: str, entry: list):
+        state, data, _ = entry
+        async with Session() as session:
+            if state is None and not data:
+                await session.execute(delete(FSMRecord).where(FSMRecord.key == key))
+            else:
+                values = {'state': state, 'data': _dumps(data), 'expires_at': datetime.utcnow() + self.ttl}
+                insert = get_insert(session.bind.dialect.name)
+                stmt = insert(FSMRecord).values(key=key, **values)
+                if session.bind.dialect.name == 'mysql':
+                    stmt = stmt.on_duplicate_key_update(**values)
+                else:
+                    stmt = stmt.on_conflict_do_update(index_elements=[FSMRecord.key], set_=values)
+                await session.execute(stmt)
+            await session.commit()
+
+    async def flush_batch(self, batch: dict):
+        for key, entry in batch.items():
+            if entry[2]:
+                await self.flush(key, entry)
+
+    async def set_state(self, key: StorageKey, state=None) -> None:
+        db_key = self.key_builder.build(key)
+        entry = list(await self._load(db_key))
+        entry[0] = state.state if isinstance(state, State) else state
+        await self._store(db_key, entry)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._load(self.key_builder.build(key)))[0]
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        db_key = self.key_builder.build(key)
+        entry = list(await self._load(db_key))
+        entry[1] = dict(data)
+        await self._store(db_key, entry)
+
+    async def get_data(self, key: StorageKey) -> dict:
+        return dict((await self._load(self.key_builder.build(key)))[1])
+
+    async def purge_expired(self) -> int:
+        """Удаляет брошенные регистрации (записи с истёкшим TTL)."""
+        async with Session() as session:
+            result = await session.execute(delete(FSMRecord).where(FSMRecord.expires_at < datetime.utcnow()))
+            await session.commit()
+        if result.rowcount:
+            logger.info(f'Удалено просроченных FSM-записей: {result.rowcount}')
+        return result.rowcount
+
+    async def close(self) -> None:
+        pass
+
+
+class BatchingEventIsolation(BaseEventIsolation):
+    """Изоляция апдейтов по ключу, которая заодно открывает пакет чтений/записей FSM.
+
+    Dispatcher держит lock на всё время обработки апдейта, поэтому пакет сбрасывается
+    в БД ровно один раз — после завершения хендлера. Lock действует только внутри процесса.
+    """
+
+    def __init__(self, storage: SQLAlchemyStorage):
+        self.storage = storage
+        self.isolation = SimpleEventIsolation()
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey):
+        async with self.isolation.lock(key):
+            batch = {}
+            token = _batch.set(batch)
+            try:
+                yield
+            finally:
+                _batch.reset(token)
+                await self.storage.flush_batch(batch)
+
+    async def close(self) -> None:
+        await self.isolation.close()
+
+
+def create_fsm_storage() -> tuple:
+    """(storage, events_isolation) для Dispatcher по настройке fsm_storage."""
+    ttl = timedelta(hours=settings.fsm_state_ttl_hours)
+    if settings.fsm_storage == 'sql':
+        storage = SQLAlchemyStorage(ttl)
+        return storage, BatchingEventIsolation(storage)
+    if settings.fsm_storage == 'redis':
+        from aiogram.fsm.storage.redis import RedisStorage
+
+        storage = RedisStorage.from_url(
+            settings.redis_url,
+            key_builder=DefaultKeyBuilder(with_bot_id=True, with_destiny=True),
+            state_ttl=ttl,
+            data_ttl=ttl,
+            json_dumps=lambda data: json.dumps(data, separators=(',', ':'), ensure_ascii=False),
+        )
+        return storage, storage.create_isolation()
+    return MemoryStorage(), SimpleEventIsolation()
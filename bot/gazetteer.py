@@ -0,0 +1,111 @@
+import asyncio
+import difflib
+import logging
+from bisect import bisect_left
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+DATA_PATH = Path(__file__).parent / 'data' / 'cities.tsv'
+MIN_PREFIX_LENGTH = 3
+
+
+class CityMatch(NamedTuple):
+    city: str
+    lat: float
+    lon: float
+    timezone: str
+
+
+def normalize_city(name: str) -> str:
+    """Ключ для сравнения названий: нижний регистр, ё -> е, дефисы и повторные пробелы -> один пробел."""
+    return ' '.join(name.lower().replace('ё', 'е').replace('-', ' ').split())
+
+
+class Gazetteer:
+    """Офлайн-справочник городов: отсортированный массив ключей и параллельный массив записей.
+
+    Файл уже отсортирован по ключу (см. scripts/build_gazetteer.py), поэтому загрузка — один проход
+    без сортировки, а поиск — бинарный.
+    """
+
+    def __init__(self, keys: list, rows: list):
+        self.keys = keys
+        self.rows = rows
+
+    @classmethod
+    def load(cls, path: Path = DATA_PATH) -> 'Gazetteer':
+        keys, rows = [], []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                key, city, lat, lon, tz = line.rstrip('\n').split('\t')
+                keys.append(key)
+                rows.append(CityMatch(city, float(lat), float(lon), tz))
+        return cls(keys, rows)
+
+    def _range(self, prefix: str) -> tuple:
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + '\uffff', lo=start)
+        return start, end
+
+    def lookup(self, name: str) -> Optional[CityMatch]:
+        """Точное совпадение с названием или одним из его альтернативных написаний."""
+        key = normalize_city(name)
+        if not key:
+            return None
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.rows[i]
+        return None
+
+    def suggest(self, name: str) -> Optional[CityMatch]:
+        """Похожий город: однозначный префикс, затем нечёткое совпадение.
+
+        Результат может оказаться другим городом («Калинин» -> Калининград), поэтому это только
+        подсказка, которую пользователь должен подтвердить. На большом справочнике difflib
+        занимает десятки миллисекунд — вызывайте через suggest_city() в отдельном потоке.
+        """
+        key = normalize_city(name)
+        if not key:
+            return None
+
+        if len(key) >= MIN_PREFIX_LENGTH:
+            start, end = self._range(key)
+            matches = {self.rows[j] for j in range(start, end)}
+            if len(matches) == 1:
+                return matches.pop()
+
+        # Нечёткий поиск только среди ключей с той же первой буквой
+        start, end = self._range(key[0])
+        close = difflib.get_close_matches(key, self.keys[start:end], n=1, cutoff=settings.gazetteer_fuzzy_cutoff)
+        if close:
+            return self.rows[bisect_left(self.keys, close[0], lo=start, hi=end)]
+        return None
+
+
+_gazetteer: Optional[Gazetteer] = None
+
+
+def get_gazetteer() -> Gazetteer:
+    global _gazetteer
+    if _gazetteer is None:
+        path = Path(settings.gazetteer_path) if settings.gazetteer_path else DATA_PATH
+        _gazetteer = Gazetteer.load(path)
+        logger.info(f'Справочник городов загружен: {len(_gazetteer.keys)} названий.')
+    return _gazetteer
+
+
+async def load_gazetteer() -> Gazetteer:
+    """Справочник, загруженный в отдельном потоке, чтобы чтение файла не блокировало event loop."""
+    if _gazetteer is not None:
+        return _gazetteer
+    return await asyncio.get_running_loop().run_in_executor(None, get_gazetteer)
+
+
+async def suggest_city(name: str) -> Optional[CityMatch]:
+    """Gazetteer.suggest в отдельном потоке."""
+    gazetteer = await load_gazetteer()
+    return await asyncio.get_running_loop().run_in_executor(None, gazetteer.suggest, name)
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import aiohttp
+
+from bot import geocache
+from bot.gazetteer import CityMatch, load_gazetteer, suggest_city
+from bot.metrics import http_request_seconds, timed, tz_lookup_seconds
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_session: Optional[aiohttp.ClientSession] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_finder = None  # TimezoneFinder; модуль (и numpy) импортируется при первом обращении
+# Один поток: поиск по полигонам не блокирует event loop, а доступ к данным finder остаётся последовательным
+_finder_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='timezonefinder')
+
+
+def get_timezone_finder():
+    """Общий экземпляр TimezoneFinder (данные полигонов загружаются один раз)."""
+    global _finder
+    if _finder is None:
+        from timezonefinder import TimezoneFinder
+        _finder = TimezoneFinder(in_memory=settings.tzfinder_in_memory)
+    return _finder
+
+
+async def warm_up_timezone_finder():
+    """Создаёт finder и выполняет пробный поиск в фоне, чтобы первый пользователь не ждал загрузки."""
+    await timezone_at(55.75, 37.61)
+    logger.info('TimezoneFinder загружен.')
+
+
+def _lookup_timezone(lat: float, lon: float) -> Optional[str]:
+    return get_timezone_finder().timezone_at(lng=lon, lat=lat)
+
+
+async def timezone_at(lat: float, lon: float) -> Optional[str]:
+    """IANA-таймзона по координатам; поиск выполняется в отдельном потоке."""
+    loop = asyncio.get_running_loop()
+    with timed(tz_lookup_seconds, 'tz'):
+        return await loop.run_in_executor(_finder_executor, _lookup_timezone, lat, lon)
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Общая HTTP-сессия для запросов к Nominatim (пул соединений и таймауты)."""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=settings.geocoder_timeout),
+            connector=aiohttp.TCPConnector(limit=settings.geocoder_pool_size, ttl_dns_cache=300),
+            headers={'User-Agent': 'BirthdayBot'},
+        )
+    return _session
+
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.geocoder_max_concurrency)
+    return _semaphore
+
+
+async def _get_json(path: str, params: dict):
+    with timed(http_request_seconds[path], 'http'):
+        async with _get_semaphore():
+            async with get_session().get(f'{settings.nominatim_url}{path}', params=params) as resp:
+                resp.raise_for_status()
+                return await resp.json(content_type=None)
+
+
+async def search_city(city: str) -> Optional[tuple]:
+    """Координаты (lat, lon) города по названию или None."""
+    data = await _get_json('/search', {'city': city, 'format': 'json', 'limit': 1})
+    logger.info(f'Nominatim response: {data}')
+    if not data:
+        return None
+    return float(data[0]['lat']), float(data[0]['lon'])
+
+
+async def reverse_city(lat: float, lon: float) -> Optional[str]:
+    """Название населённого пункта по координатам или None."""
+    data = await _get_json('/reverse', {'lat': lat, 'lon': lon, 'format': 'json'})
+    if not data or 'address' not in data:
+        return None
+    address = data['address']
+    return address.get('city') or address.get('town') or address.get('village') or address.get('municipality')
+
+
+async def resolve_timezone(city: Optional[str], location=None) -> tuple:
+    """Определяет (city, tz) по тексту сообщения или геолокации; tz равен None, если не найден."""
+    if location:
+        key = geocache.location_key(location.latitude, location.longitude)
+    elif city:
+        key = geocache.city_key(city)
+    else:
+        return city, None
+    cached = await geocache.get(key)
+    if cached:
+        logger.info(f'Кэш геокодирования: {key} -> {cached}')
+        cached_city, tz = cached
+        return city or cached_city, tz
+
+    tz = None
+    if location:
+        tz = await timezone_at(location.latitude, location.longitude)
+        logger.info(f'timezonefinder по геолокации: {tz}')
+        if not city:
+            city = await reverse_city(location.latitude, location.longitude)
+    elif city:
+        # Офлайн принимается только точное совпадение: похожее название может оказаться другим городом
+        match = (await load_gazetteer()).lookup(city) if settings.gazetteer_enabled else None
+        if match:
+            logger.info(f'Справочник городов: {city} -> {match}')
+            await geocache.put(key, match.city, match.timezone)
+            return match.city, match.timezone
+        coords = await search_city(city)
+        if coords:
+            lat, lon = coords
+            logger.info(f'Координаты города: lat={lat}, lon={lon}')
+            tz = await timezone_at(lat, lon)
+            logger.info(f'timezonefinder по координатам: {tz}')
+    if tz:
+        await geocache.put(key, city, tz)
+    return city, tz
+
+
+async def suggest_timezone(city: str) -> Optional[CityMatch]:
+    """Похожий город из справочника, когда Nominatim ничего не нашёл.
+
+    Только подсказка для подтверждения пользователем: в кэш геокодирования не записывается.
+    """
+    if not city or not settings.gazetteer_enabled:
+        return None
+    match = await suggest_city(city)
+    if match:
+        logger.info(f'Подсказка справочника: {city} -> {match}')
+    return match
@@ -0,0 +1,101 @@
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+from bot.db.database import Session
+from bot.db.geocache.models import GeoCacheEntry
+from bot.gazetteer import normalize_city
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Ограниченный по размеру LRU-кэш со счётчиками попаданий."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+_memory = LRUCache(settings.geocache_size)
+_db_hits = 0
+_db_misses = 0
+
+
+def city_key(city: str) -> str:
+    return 'city:' + normalize_city(city)
+
+
+def location_key(lat: float, lon: float) -> str:
+    precision = settings.geocache_grid_precision
+    return f'point:{round(lat, precision)}:{round(lon, precision)}'
+
+
+async def get(key: str) -> Optional[tuple]:
+    """(city, tz) из памяти, затем из БД (если включено), иначе None."""
+    global _db_hits, _db_misses
+    value = _memory.get(key)
+    if value is not None or not settings.geocache_persistent:
+        return value
+    try:
+        async with Session() as session:
+            entry = await session.get(GeoCacheEntry, key)
+    except Exception as e:
+        logger.error(f'Ошибка чтения кэша геокодирования: {e}')
+        return None
+    if entry is None:
+        _db_misses += 1
+        return None
+    _db_hits += 1
+    value = (entry.city, entry.timezone)
+    _memory.set(key, value)
+    return value
+
+
+async def put(key: str, city: Optional[str], tz: str):
+    _memory.set(key, (city, tz))
+    if not settings.geocache_persistent:
+        return
+    try:
+        async with Session() as session:
+            await session.merge(GeoCacheEntry(key=key, city=city, timezone=tz))
+            await session.commit()
+    except Exception as e:
+        logger.error(f'Ошибка записи кэша геокодирования: {e}')
+
+
+def get_stats() -> dict:
+    db_total = _db_hits + _db_misses
+    return {
+        'memory_size': len(_memory.data),
+        'memory_hits': _memory.hits,
+        'memory_misses': _memory.misses,
+        'memory_hit_rate': _memory.hit_rate,
+        'db_hits': _db_hits,
+        'db_misses': _db_misses,
+        'db_hit_rate': _db_hits / db_total if db_total else 0.0,
+    }
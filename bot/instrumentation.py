@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import TelegramObject
+from aiohttp import web
+
+from bot import geocache
+from bot.metrics import (
+    breakdown, db_query_seconds, handler_errors, handler_phase_seconds, handler_seconds,
+    http_request_seconds, outbox_batch_seconds, outbox_events, outbox_failures, render,
+    scheduler_events, scheduler_run_seconds, telegram_request_seconds, timed, tz_lookup_seconds,
+)
+from bot.outbox import get_outbox_stats
+from bot.tasks import spawn
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+PHASES = ('db', 'http', 'tz', 'telegram')
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Латентность обработчиков и её разбивка на БД, HTTP (Nominatim), TimezoneFinder и Bot API.
+
+    Регистрируется как inner-middleware роутера: к этому моменту известен выбранный обработчик.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict,
+    ) -> Any:
+        handler_object = data.get('handler')
+        name = handler_object.callback.__name__ if handler_object else type(event).__name__
+        started = time.perf_counter()
+        with breakdown() as spent:
+            try:
+                return await handler(event, data)
+            except Exception:
+                handler_errors.inc(name)
+                raise
+            finally:
+                total = time.perf_counter() - started
+                handler_seconds[name].observe(total)
+                for phase in PHASES:
+                    handler_phase_seconds[name, phase].observe(spent.get(phase, 0.0))
+                handler_phase_seconds[name, 'other'].observe(max(total - sum(spent.values()), 0.0))
+
+
+class TelegramTimingMiddleware(BaseRequestMiddleware):
+    """Время вызовов Bot API по методу; внутри обработчика засчитывается в фазу telegram."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        with timed(telegram_request_seconds[type(method).__name__], 'telegram'):
+            return await make_request(bot, method)
+
+
+async def render_metrics() -> str:
+    """Все метрики бота в текстовом формате Prometheus."""
+    lines = [
+        *render('birthdaybot_handler_seconds', handler_seconds, ('handler',)),
+        *render('birthdaybot_handler_phase_seconds', handler_phase_seconds, ('handler', 'phase')),
+        *render('birthdaybot_handler_errors_total', handler_errors, ('handler',)),
+        *render('birthdaybot_db_query_seconds', db_query_seconds, ('statement',)),
+        *render('birthdaybot_http_request_seconds', http_request_seconds, ('path',)),
+        *render('birthdaybot_tz_lookup_seconds', tz_lookup_seconds),
+        *render('birthdaybot_telegram_request_seconds', telegram_request_seconds, ('method',)),
+        *render('birthdaybot_scheduler_run_seconds', scheduler_run_seconds),
+        *render('birthdaybot_scheduler_events_total', scheduler_events, ('event',)),
+        *render('birthdaybot_outbox_batch_seconds', outbox_batch_seconds),
+        *render('birthdaybot_outbox_events_total', outbox_events, ('event',)),
+        *render('birthdaybot_outbox_failures_total', outbox_failures, ('kind',)),
+        *render('birthdaybot_geocache', geocache.get_stats(), ('stat',)),
+    ]
+    try:
+        lines += render('birthdaybot_outbox', await get_outbox_stats(), ('stat',))
+    except Exception as e:
+        logger.warning(f'Не удалось получить статистику outbox: {e}')
+    return '\n'.join(lines) + '\n'
+
+
+def format_summary() -> str:
+    """Короткая сводка для периодического лога: p50/p99 обработчиков и счётчики фоновых задач."""
+    parts = []
+    for name, histogram in sorted(handler_seconds.items()):
+        phases = ' '.join(
+            f'{phase}={handler_phase_seconds[name, phase].sum / histogram.count * 1000:.0f}'
+            for phase in PHASES + ('other',)
+        )
+        parts.append(
+            f'{name}: n={histogram.count} p50={histogram.quantile(0.5) * 1000:.0f}мс '
+            f'p99={histogram.quantile(0.99) * 1000:.0f}мс (среднее, мс: {phases})'
+        )
+    parts.append(f'планировщик: {dict(scheduler_events)}; outbox: {dict(outbox_events)}, ошибки {dict(outbox_failures)}')
+    parts.append(f'геокэш: hit rate {geocache.get_stats()["memory_hit_rate"]:.0%}')
+    return '\n'.join(parts)
+
+
+async def _log_summary_loop(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        logger.info(f'Метрики:\n{format_summary()}')
+
+
+async def start_metrics(worker: int = 0) -> Optional[web.AppRunner]:
+    """Поднимает /metrics на settings.metrics_port + worker и/или периодический лог сводки."""
+    if settings.metrics_log_interval_minutes:
+        spawn(_log_summary_loop(settings.metrics_log_interval_minutes * 60), name='metrics_summary')
+    if settings.metrics_port is None:
+        return None
+
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(text=await render_metrics(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    port = settings.metrics_port + worker
+    await web.TCPSite(runner, settings.metrics_host, port).start()
+    logger.info(f'Метрики доступны на {settings.metrics_host}:{port}/metrics')
+    return runner
@@ -1,9 +1,10 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
+from bot.calendar import CalendarAction, cal
 
 def get_confirm_birthday_kb():
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text='✅ Подтвердить', callback_data='confirm_birthday')],
-        [InlineKeyboardButton(text='✏️ Изменить', callback_data='cal:change')]
+        [InlineKeyboardButton(text='✏️ Изменить', callback_data=cal(CalendarAction.CHANGE))]
     ])
 
 def get_timezone_share_kb():
@@ -0,0 +1,54 @@
+"""Готовые тексты отсчёта до дня рождения.
+
+Число дней лежит в 0..MAX_DAYS, поэтому все варианты строятся один раз при импорте,
+и планировщик с обработчиками только берут строку по индексу. Локализация — ещё один набор таблиц.
+"""
+
+# Дней до/после дня рождения не бывает больше, чем в високосном году
+MAX_DAYS = 366
+
+
+def plural(n: int, one: str, few: str, many: str) -> str:
+    """Форма слова для числа n: 1 день, 2 дня, 5 дней, 11 дней, 21 день."""
+    if n % 10 == 1 and n % 100 != 11:
+        return one
+    if 2 <= n % 10 <= 4 and not 12 <= n % 100 <= 14:
+        return few
+    return many
+
+
+def _days(n: int) -> str:
+    return f'<b>{n}</b> {plural(n, "день", "дня", "дней")}'
+
+
+def _build(birthday: str, eve: str, template: str, verb: tuple) -> tuple:
+    texts = [template.format(verb=plural(n, *verb), days=_days(n)) for n in range(MAX_DAYS + 1)]
+    texts[0] = birthday
+    if eve:
+        texts[1] = eve
+    return tuple(texts)
+
+
+# Уведомление планировщика (отправляется с parse_mode='HTML')
+COUNTDOWN_TEXTS = _build(
+    '🎉 С днём рождения! 🎂',
+    '🎉 Ваш день рождения уже завтра! 🎂',
+    '🎉 До вашего дня рождения {verb} {days}!',
+    ('остался', 'осталось', 'осталось'),
+)
+
+# Ответ на «Сколько дней до дня рождения?»
+DAYS_UNTIL_TEXTS = _build(
+    '🎉 С ДНЁМ РОЖДЕНИЯ! 🎂',
+    '🎉 Ваш день рождения уже завтра! 🎂',
+    '🎂 До вашего дня рождения {verb} {days}!',
+    ('остался', 'осталось', 'осталось'),
+)
+
+# Ответ на «Сколько дней со дня рождения?»
+DAYS_SINCE_TEXTS = _build(
+    '🎉 Ваш день рождения — сегодня! 🎂',
+    '',
+    '📅 С вашего дня рождения {verb} {days}!',
+    ('прошёл', 'прошло', 'прошло'),
+)
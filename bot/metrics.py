@@ -0,0 +1,155 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Границы корзин гистограмм латентности, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (как histogram в Prometheus)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по верхней границе корзины."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class HistogramFamily(dict):
+    """Набор гистограмм по значению метки."""
+
+    def __missing__(self, label):
+        histogram = self[label] = Histogram()
+        return histogram
+
+    @contextmanager
+    def time(self, label):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self[label].observe(time.perf_counter() - started)
+
+
+class CounterFamily(dict):
+    """Набор монотонных счётчиков по значению метки."""
+
+    def __missing__(self, label):
+        return 0
+
+    def inc(self, label, value=1):
+        self[label] = self[label] + value
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+
+def _family_items(family: dict, label_names: tuple):
+    for key, value in sorted(family.items(), key=lambda item: str(item[0])):
+        values = key if isinstance(key, tuple) else (key,)
+        yield dict(zip(label_names, values)), value
+
+
+def render_histogram(name: str, histogram: Histogram, labels: Optional[dict] = None) -> list:
+    """Строки histogram в текстовом формате Prometheus (корзины накопительные)."""
+    labels = labels or {}
+    lines, seen = [], 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        seen += count
+        lines.append(f'{name}_bucket{_format_labels({**labels, "le": bound})} {seen}')
+    lines.append(f'{name}_bucket{_format_labels({**labels, "le": "+Inf"})} {histogram.count}')
+    lines.append(f'{name}_sum{_format_labels(labels)} {histogram.sum}')
+    lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+    return lines
+
+
+def render(name: str, metric, label_names: tuple = (), kind: Optional[str] = None) -> list:
+    """Метрика (Histogram, HistogramFamily, CounterFamily или словарь значений) в формате Prometheus."""
+    if isinstance(metric, Histogram):
+        return [f'# TYPE {name} histogram', *render_histogram(name, metric)]
+    if isinstance(metric, HistogramFamily):
+        lines = [f'# TYPE {name} histogram']
+        for labels, histogram in _family_items(metric, label_names):
+            lines.extend(render_histogram(name, histogram, labels))
+        return lines
+    kind = kind or ('counter' if isinstance(metric, CounterFamily) else 'gauge')
+    lines = [f'# TYPE {name} {kind}']
+    for labels, value in _family_items(metric, label_names):
+        lines.append(f'{name}{_format_labels(labels)} {value}')
+    return lines
+
+
+# Время текущего апдейта по категориям (db, http, tz, telegram); None вне обработчика
+_spent: ContextVar[Optional[dict]] = ContextVar('metrics_spent', default=None)
+
+
+@contextmanager
+def breakdown():
+    """Собирает время, потраченное внутри блока на БД, HTTP и т.д.; отдаёт словарь категория -> секунды."""
+    spent = {}
+    token = _spent.set(spent)
+    try:
+        yield spent
+    finally:
+        _spent.reset(token)
+
+
+def add_time(category: str, seconds: float):
+    spent = _spent.get()
+    if spent is not None:
+        spent[category] = spent.get(category, 0.0) + seconds
+
+
+@contextmanager
+def timed(histogram: Histogram, category: str):
+    """Замеряет блок в histogram и засчитывает время в категорию текущего апдейта."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed)
+        add_time(category, elapsed)
+
+
+# Латентность SQL-запросов по типу оператора (SELECT, INSERT, ...)
+db_query_seconds = HistogramFamily()
+# Запросы к Nominatim по пути и поиск таймзоны по координатам
+http_request_seconds = HistogramFamily()
+tz_lookup_seconds = Histogram()
+# Вызовы Bot API по имени метода
+telegram_request_seconds = HistogramFamily()
+# Обработчики: полное время и его части (handler, db/http/tz/telegram/other)
+handler_seconds = HistogramFamily()
+handler_phase_seconds = HistogramFamily()
+handler_errors = CounterFamily()
+# Тики планировщика: runs, users_scanned, enqueued, errors
+scheduler_run_seconds = Histogram()
+scheduler_events = CounterFamily()
+# Отправка из outbox: sent, retried, dead и классы ошибок
+outbox_batch_seconds = Histogram()
+outbox_events = CounterFamily()
+outbox_failures = CounterFamily()
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional
+
+from aiogram import Bot
+from sqlalchemy import delete, func, select, update
+
+from bot.broadcast import Broadcaster, PERMANENT_ERRORS, classify_send_error
+from bot.db.database import Session, get_insert
+from bot.db.outbox.models import OutboxMessage
+from bot.db.users.repository import disable_notifications
+from bot.metrics import outbox_batch_seconds, outbox_events, outbox_failures
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+DEAD = 'dead'
+# Строк за один DELETE при чистке: не держать долгие блокировки на большой таблице
+PURGE_BATCH_SIZE = 10000
+
+
+@lru_cache(maxsize=None)
+def get_enqueue_statement(dialect_name: str):
+    """INSERT в outbox, пропускающий повторы по uq_outbox_user_date.
+
+    Один заранее собранный оператор на диалект: строки передаются параметрами executemany,
+    поэтому SQLAlchemy не компилирует заново многострочный VALUES на каждую пачку.
+    """
+    stmt = get_insert(dialect_name)(OutboxMessage)
+    if dialect_name == 'mysql':
+        return stmt.prefix_with('IGNORE')
+    return stmt.on_conflict_do_nothing(index_elements=[OutboxMessage.user_id, OutboxMessage.local_date])
+
+
+async def enqueue(session, rows: list):
+    """Массово ставит (user_id, local_date, payload) в очередь без коммита.
+
+    Повторная постановка того же уведомления за ту же дату игнорируется уникальным ключом.
+    """
+    if not rows:
+        return
+    now = datetime.utcnow()
+    await session.execute(get_enqueue_statement(session.bind.dialect.name), [
+        {'user_id': user_id, 'local_date': local_date, 'payload': payload,
+         'status': PENDING, 'attempts': 0, 'next_attempt_at': now}
+        for user_id, local_date, payload in rows
+    ])
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Экспоненциальная задержка перед повтором: base, 2*base, 4*base, ..."""
+    return timedelta(seconds=settings.outbox_retry_base_seconds * 2 ** (attempts - 1))
+
+
+class OutboxSender:
+    """Пул асинхронных отправителей, разбирающих очередь outbox пачками.
+
+    Пачка забирается через SELECT ... FOR UPDATE SKIP LOCKED и помечается sending с дедлайном;
+    если процесс упал, после дедлайна пачку заберёт другой отправитель.
+    """
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        # Лимит Telegram действует на токен, а не на процесс: каждый из отправителей получает свою долю
+        self.broadcaster = Broadcaster(bot, rate=settings.broadcast_rate / max(settings.outbox_instances, 1))
+        self._tasks = []
+
+    async def claim_batch(self) -> list:
+        now = datetime.utcnow()
+        async with Session() as session:
+            result = await session.execute(
+                select(OutboxMessage.id, OutboxMessage.user_id, OutboxMessage.payload, OutboxMessage.attempts)
+                .where(OutboxMessage.status.in_((PENDING, SENDING)), OutboxMessage.next_attempt_at <= now)
+                .order_by(OutboxMessage.next_attempt_at)
+                .limit(settings.outbox_batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            rows = result.all()
+            if rows:
+                # Условие по next_attempt_at не даёт двум отправителям забрать одну строку в SQLite
+                result = await session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_([row.id for row in rows]), OutboxMessage.next_attempt_at <= now)
+                    .values(status=SENDING, next_attempt_at=now + timedelta(seconds=settings.outbox_visibility_timeout))
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount != len(rows):
+                    await session.rollback()
+                    return []
+            await session.commit()
+        return rows
+
+    async def process_batch(self, rows: list):
+        stats = await self.broadcaster.run([(row.user_id, row.payload) for row in rows], parse_mode='HTML')
+        outbox_batch_seconds.observe(stats.duration)
+        now = datetime.utcnow()
+        sent_ids, dead, retry, unreachable = [], [], [], []
+        for row in rows:
+            error = stats.errors.get(row.user_id)
+            if error is None:
+                sent_ids.append(row.id)
+                continue
+            kind = classify_send_error(error)
+            outbox_failures.inc(kind)
+            if kind in PERMANENT_ERRORS:
+                unreachable.append(row.user_id)
+                dead.append((row, f'{kind}: {error}'))
+            elif row.attempts + 1 >= settings.outbox_max_attempts:
+                dead.append((row, f'{kind}: {error}'))
+            else:
+                retry.append((row, f'{kind}: {error}'))
+
+        async with Session() as session:
+            if sent_ids:
+                await session.execute(
+                    update(OutboxMessage).where(OutboxMessage.id.in_(sent_ids))
+                    .values(status=SENT, sent_at=now).execution_options(synchronize_session=False)
+                )
+            for row, error in dead:
+                await session.execute(
+                    update(OutboxMessage).where(OutboxMessage.id == row.id)
+                    .values(status=DEAD, attempts=row.attempts + 1, last_error=str(error)[:255])
+                    .execution_options(synchronize_session=False)
+                )
+            for row, error in retry:
+                await session.execute(
+                    update(OutboxMessage).where(OutboxMessage.id == row.id)
+                    .values(
+                        status=PENDING,
+                        attempts=row.attempts + 1,
+                        next_attempt_at=now + retry_delay(row.attempts + 1),
+                        last_error=str(error)[:255],
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            await session.commit()
+
+        if unreachable and settings.prune_unreachable_users:
+            # Недоступные навсегда пользователи исключаются из рассылки до повторной регистрации
+            await disable_notifications(unreachable)
+
+        outbox_events.inc('sent', len(sent_ids))
+        outbox_events.inc('retried', len(retry))
+        outbox_events.inc('dead', len(dead))
+        logger.info(
+            f'Outbox: отправлено {len(sent_ids)}, повтор {len(retry)}, в dead-letter {len(dead)}, '
+            f'{stats.duration:.1f} с, {stats.throughput:.1f} сообщ./с'
+        )
+
+    async def _loop(self):
+        while True:
+            try:
+                rows = await self.claim_batch()
+                if rows:
+                    await self.process_batch(rows)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f'Ошибка отправителя outbox: {e}', exc_info=True)
+            await asyncio.sleep(settings.outbox_poll_interval)
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._loop()) for _ in range(settings.outbox_workers)]
+        logger.info(f'Отправители outbox запущены: {settings.outbox_workers}')
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+async def purge_outbox(retention: Optional[timedelta] = None) -> int:
+    """Удаляет отправленные и dead-letter строки старше retention (по умолчанию settings.outbox_retention_days)."""
+    cutoff = datetime.utcnow() - (retention or timedelta(days=settings.outbox_retention_days))
+    deleted = 0
+    while True:
+        async with Session() as session:
+            ids = (await session.execute(
+                select(OutboxMessage.id)
+                .where(OutboxMessage.status.in_((SENT, DEAD)), OutboxMessage.created_at < cutoff)
+                .limit(PURGE_BATCH_SIZE)
+            )).scalars().all()
+            if not ids:
+                break
+            await session.execute(
+                delete(OutboxMessage).where(OutboxMessage.id.in_(ids)).execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        deleted += len(ids)
+        if len(ids) < PURGE_BATCH_SIZE:
+            break
+    if deleted:
+        logger.info(f'Outbox: удалено старых строк: {deleted}')
+    return deleted
+
+
+async def get_outbox_stats(window: timedelta = timedelta(minutes=5)) -> dict:
+    """Глубина очереди по статусам, возраст самого старого pending и скорость разбора за window.
+
+    Отправленные строки не считаются: их число растёт до чистки, а подсчёт по остальным статусам
+    идёт по индексу ix_outbox_status_next_attempt.
+    """
+    now = datetime.utcnow()
+    async with Session() as session:
+        counts = dict((await session.execute(
+            select(OutboxMessage.status, func.count())
+            .where(OutboxMessage.status.in_((PENDING, SENDING, DEAD)))
+            .group_by(OutboxMessage.status)
+        )).all())
+        oldest = (await session.execute(
+            select(func.min(OutboxMessage.created_at)).where(OutboxMessage.status.in_((PENDING, SENDING)))
+        )).scalar()
+        recent = (await session.execute(
+            select(func.count()).where(OutboxMessage.status == SENT, OutboxMessage.sent_at >= now - window)
+        )).scalar()
+    return {
+        'pending': counts.get(PENDING, 0),
+        'sending': counts.get(SENDING, 0),
+        'dead': counts.get(DEAD, 0),
+        'oldest_pending_seconds': (now - oldest).total_seconds() if oldest else 0.0,
+        'drain_rate': recent / window.total_seconds(),
+    }
@@ -6,20 +6,38 @@ from .states import RegisterState, SettingsState
 from .keyboards import get_confirm_birthday_kb, get_timezone_share_kb, get_main_menu_kb
 import re
 from datetime import datetime, date
-import requests
-from timezonefinder import TimezoneFinder
 import pytz
 import logging
 from aiogram import F
-from bot.calendar import get_years_kb, get_months_kb, get_days_kb, get_confirm_kb
+from bot import birthdays
+from bot.calendar import (
+    START_YEAR, YEARS_PER_PAGE, CalendarAction, CalendarCallback,
+    get_years_kb, get_months_kb, get_days_kb, get_confirm_kb,
+)
+from bot.geo import resolve_timezone, suggest_timezone
+from bot.messages import DAYS_SINCE_TEXTS, DAYS_UNTIL_TEXTS
 
-from sqlalchemy import select, update
-from bot.db.database import get_db
-from bot.db.users.models import User
+from bot.db.users.repository import get_profile, upsert_user, delete_user
 
 router = Router()
 logger = logging.getLogger(__name__)
 
+DATE_RE = re.compile(r'^(\d{2})\.(\d{2})\.(\d{4})$')
+
+
+async def parse_birthday(message: Message):
+    """Дата из текста ДД.ММ.ГГГГ; при ошибке отвечает пользователю и возвращает None."""
+    match = DATE_RE.match(message.text.strip()) if message.text else None
+    if not match:
+        await message.answer('❗ Пожалуйста, введите дату в формате ДД.ММ.ГГГГ (например, 11.11.2000)')
+        return None
+    day, month, year = map(int, match.groups())
+    try:
+        return date(year, month, day)
+    except ValueError:
+        await message.answer('❗ Некорректная дата. Попробуйте ещё раз.')
+        return None
+
 def get_confirm_timezone_kb(tz, city=None):
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -52,6 +70,10 @@ def get_timezone_message(city, timezone):
     
     return message
 
+def get_suggestion_message(query, match):
+    # Подсказка справочника может быть другим городом, поэтому явно спрашиваем пользователя
+    return f'🤔 Город «{query}» не найден. Возможно, вы имели в виду {match.city}?\n\n' + get_timezone_message(match.city, match.timezone)
+
 # Команда /menu работает ВСЕГДА
 @router.message(Command('menu'))
 async def show_main_menu(message: Message, state: FSMContext):
@@ -90,14 +112,8 @@ async def cmd_help(message: Message):
 
 @router.message(RegisterState.waiting_for_birthday)
 async def process_birthday(message: Message, state: FSMContext):
-    date_text = message.text.strip()
-    if not re.match(r"^\d{2}\.\d{2}\.\d{4}$", date_text):
-        await message.answer('❗ Пожалуйста, введите дату в формате ДД.ММ.ГГГГ (например, 11.11.2000)')
-        return
-    try:
-        birthday = datetime.strptime(date_text, '%d.%m.%Y').date()
-    except ValueError:
-        await message.answer('❗ Некорректная дата. Попробуйте ещё раз.')
+    birthday = await parse_birthday(message)
+    if not birthday:
         return
     await state.update_data(birthday=birthday.isoformat())
     await message.answer(
@@ -119,16 +135,7 @@ async def confirm_birthday(callback_query: CallbackQuery, state: FSMContext):
     except Exception:
         birth_date = None
 
-    async for session in get_db():
-        result = await session.execute(select(User).where(User.user_id == callback_query.from_user.id))
-        user = result.scalar_one_or_none()
-        if user:
-            user.birthday = birth_date
-            user.notifications_enabled = True
-        else:
-            user = User(user_id=callback_query.from_user.id, birthday=birth_date, notifications_enabled=True)
-            session.add(user)
-        await session.commit()
+    await upsert_user(callback_query.from_user.id, birthday=birth_date, notifications_enabled=True)
 
     await callback_query.message.answer(
         'Теперь отправьте ваш город или поделитесь геолокацией для определения часового пояса.',
@@ -143,32 +150,16 @@ async def process_timezone(message: Message, state: FSMContext):
     try:
         logger.info(f'FSM: ожидание часового пояса, user_id={message.from_user.id}')
         logger.info(f'Получено сообщение: text={message.text}, location={message.location}')
-        tz = None
         city = message.text.strip() if message.text else None
         location = message.location
-        tf = TimezoneFinder()
         logger.info(f'city={city}, location={location}')
-        
-        if location:
-            tz = tf.timezone_at(lng=location.longitude, lat=location.latitude)
-            logger.info(f'timezonefinder по геолокации: {tz}')
-            if not city:
-                url = f'https://nominatim.openstreetmap.org/reverse?lat={location.latitude}&lon={location.longitude}&format=json'
-                resp = requests.get(url, headers={'User-Agent': 'BirthdayBot'})
-                data = resp.json()
-                if data and 'address' in data:
-                    city = data['address'].get('city') or data['address'].get('town') or data['address'].get('village') or data['address'].get('municipality')
-        elif city:
-            url = f'https://nominatim.openstreetmap.org/search?city={city}&format=json&limit=1'
-            resp = requests.get(url, headers={'User-Agent': 'BirthdayBot'})
-            data = resp.json()
-            logger.info(f'Nominatim response: {data}')
-            if data:
-                lat = float(data[0]['lat'])
-                lon = float(data[0]['lon'])
-                logger.info(f'Координаты города: lat={lat}, lon={lon}')
-                tz = tf.timezone_at(lng=lon, lat=lat)
-                logger.info(f'timezonefinder по координатам: {tz}')
+        city, tz = await resolve_timezone(city, location)
+        timezone_message = get_timezone_message(city, tz) if tz else None
+        if not tz and not location:
+            match = await suggest_timezone(city)
+            if match:
+                timezone_message = get_suggestion_message(city, match)
+                city, tz = match.city, match.timezone
         
         logger.info(f'city={city}, location={location}, tz={tz}')
         if not tz:
@@ -178,7 +169,6 @@ async def process_timezone(message: Message, state: FSMContext):
         
         await state.update_data(timezone=tz, city=city)
         
-        timezone_message = get_timezone_message(city, tz)
         await message.answer(
             timezone_message,
             reply_markup=get_confirm_timezone_kb(tz, city)
@@ -196,16 +186,7 @@ async def confirm_timezone_handler(callback: CallbackQuery, state: FSMContext):
     user_data = await state.get_data()
     city = user_data.get('city')
     
-    async for session in get_db():
-        result = await session.execute(select(User).where(User.user_id == callback.from_user.id))
-        user = result.scalar_one_or_none()
-        if user:
-            user.timezone = tz
-            user.city = city
-        else:
-            user = User(user_id=callback.from_user.id, timezone=tz, city=city, notifications_enabled=True)
-            session.add(user)
-        await session.commit()
+    await upsert_user(callback.from_user.id, timezone=tz, city=city)
 
     timezone_message = get_timezone_message(city, tz)
     await callback.message.edit_text(f'{timezone_message}\n\n✅ Регистрация завершена! 🎉')
@@ -225,27 +206,14 @@ async def change_timezone_handler(callback: CallbackQuery, state: FSMContext):
 @router.message(SettingsState.waiting_for_new_timezone)
 async def set_new_timezone(message: Message, state: FSMContext):
     try:
-        tz = None
         city = message.text.strip() if message.text else None
-        location = message.location
-        tf = TimezoneFinder()
-        
-        if location:
-            tz = tf.timezone_at(lng=location.longitude, lat=location.latitude)
-            if not city:
-                url = f'https://nominatim.openstreetmap.org/reverse?lat={location.latitude}&lon={location.longitude}&format=json'
-                resp = requests.get(url, headers={'User-Agent': 'BirthdayBot'})
-                data = resp.json()
-                if data and 'address' in data:
-                    city = data['address'].get('city') or data['address'].get('town') or data['address'].get('village') or data['address'].get('municipality')
-        elif city:
-            url = f'https://nominatim.openstreetmap.org/search?city={city}&format=json&limit=1'
-            resp = requests.get(url, headers={'User-Agent': 'BirthdayBot'})
-            data = resp.json()
-            if data:
-                lat = float(data[0]['lat'])
-                lon = float(data[0]['lon'])
-                tz = tf.timezone_at(lng=lon, lat=lat)
+        city, tz = await resolve_timezone(city, message.location)
+        timezone_message = get_timezone_message(city, tz) if tz else None
+        if not tz and not message.location:
+            match = await suggest_timezone(city)
+            if match:
+                timezone_message = get_suggestion_message(city, match)
+                city, tz = match.city, match.timezone
         
         if not tz:
             await message.answer('❗ Не удалось определить часовой пояс. Попробуйте отправить геолокацию или другой город.')
@@ -253,7 +221,6 @@ async def set_new_timezone(message: Message, state: FSMContext):
         
         await state.update_data(timezone=tz, city=city)
         
-        timezone_message = get_timezone_message(city, tz)
         await message.answer(
             timezone_message,
             reply_markup=get_confirm_timezone_kb(tz, city)
@@ -270,16 +237,7 @@ async def confirm_timezone_change_handler(callback: CallbackQuery, state: FSMCon
     user_data = await state.get_data()
     city = user_data.get('city')
     
-    async for session in get_db():
-        result = await session.execute(select(User).where(User.user_id == callback.from_user.id))
-        user = result.scalar_one_or_none()
-        if user:
-            user.timezone = tz
-            user.city = city
-        else:
-            user = User(user_id=callback.from_user.id, timezone=tz, city=city, notifications_enabled=True)
-            session.add(user)
-        await session.commit()
+    await upsert_user(callback.from_user.id, timezone=tz, city=city)
 
     timezone_message = get_timezone_message(city, tz)
     await callback.message.edit_text(f'{timezone_message}\n\n✅ Часовой пояс обновлён!')
@@ -297,46 +255,25 @@ async def change_timezone_change_handler(callback: CallbackQuery, state: FSMCont
 # Основные команды меню
 @router.message(F.text & F.text.strip().lower() == 'сколько дней до дня рождения?')
 async def days_until_birthday(message: Message):
-    async for session in get_db():
-        result = await session.execute(select(User).where(User.user_id == message.from_user.id))
-        user = result.scalar_one_or_none()
+    user = await get_profile(message.from_user.id)
 
-        if not user or not user.birthday or not user.timezone:
-            await message.answer('Сначала завершите регистрацию!')
-            return
+    if not user or not user.birthday or not user.timezone:
+        await message.answer('Сначала завершите регистрацию!')
+        return
 
-        birthday = user.birthday
-        tz = pytz.timezone(user.timezone)
-        now = datetime.now(tz).date()
-        next_birthday = birthday.replace(year=now.year)
-        if next_birthday < now:
-            next_birthday = next_birthday.replace(year=now.year + 1)
-        days = (next_birthday - now).days
-        if days == 1:
-            await message.answer('🎉 Ваш день рождения уже завтра! 🎂')
-        elif days == 0:
-            await message.answer('🎉 С ДНЁМ РОЖДЕНИЯ! 🎂')
-        else:
-            await message.answer(f'🎂 До вашего дня рождения осталось <b>{days}</b> дней!', parse_mode='HTML')
+    days = birthdays.days_until_birthday(user.birthday, birthdays.local_today(user.timezone))
+    await message.answer(DAYS_UNTIL_TEXTS[days], parse_mode='HTML')
 
 @router.message(F.text & F.text.strip().lower() == 'сколько дней со дня рождения?')
 async def days_since_birthday(message: Message):
-    async for session in get_db():
-        result = await session.execute(select(User).where(User.user_id == message.from_user.id))
-        user = result.scalar_one_or_none()
+    user = await get_profile(message.from_user.id)
 
-        if not user or not user.birthday or not user.timezone:
-            await message.answer('Сначала завершите регистрацию!')
-            return
+    if not user or not user.birthday or not user.timezone:
+        await message.answer('Сначала завершите регистрацию!')
+        return
 
-        birthday = user.birthday
-        tz = pytz.timezone(user.timezone)
-        now = datetime.now(tz).date()
-        last_birthday = birthday.replace(year=now.year)
-        if last_birthday > now:
-            last_birthday = last_birthday.replace(year=now.year - 1)
-        days = (now - last_birthday).days
-        await message.answer(f'📅 С вашего дня рождения прошло <b>{days}</b> дней!', parse_mode='HTML')
+    days = birthdays.days_since_birthday(user.birthday, birthdays.local_today(user.timezone))
+    await message.answer(DAYS_SINCE_TEXTS[days], parse_mode='HTML')
 
 @router.message(F.text & F.text.strip().lower() == 'изменить дату')
 async def change_birthday_menu(message: Message, state: FSMContext):
@@ -345,25 +282,10 @@ async def change_birthday_menu(message: Message, state: FSMContext):
 
 @router.message(SettingsState.waiting_for_new_birthday)
 async def set_new_birthday(message: Message, state: FSMContext):
-    date_text = message.text.strip()
-    if not re.match(r"^\d{2}\.\d{2}\.\d{4}$", date_text):
-        await message.answer('❗ Пожалуйста, введите дату в формате ДД.ММ.ГГГГ (например, 11.11.2000)')
+    birthday = await parse_birthday(message)
+    if not birthday:
         return
-    try:
-        birthday = datetime.strptime(date_text, '%d.%m.%Y').date()
-    except ValueError:
-        await message.answer('❗ Некорректная дата. Попробуйте ещё раз.')
-        return
-    async for session in get_db():
-        result = await session.execute(select(User).where(User.user_id == message.from_user.id))
-        user = result.scalar_one_or_none()
-        if user:
-            user.birthday = birthday
-            user.notifications_enabled = True
-        else:
-            user = User(user_id=message.from_user.id, birthday=birthday, notifications_enabled=True)
-            session.add(user)
-        await session.commit()
+    await upsert_user(message.from_user.id, birthday=birthday, notifications_enabled=True)
 
     await message.answer('Дата рождения обновлена!')
     await state.clear()
@@ -375,43 +297,39 @@ async def change_timezone_menu(message: Message, state: FSMContext):
 
 @router.message(F.text & F.text.strip().lower() == 'мои настройки')
 async def show_settings(message: Message):
-    async for session in get_db():
-        result = await session.execute(select(User).where(User.user_id == message.from_user.id))
-        user = result.scalar_one_or_none()
+    user = await get_profile(message.from_user.id)
 
-        if not user:
-            await message.answer('Вы еще не завершили регистрацию!')
-            return
+    if not user:
+        await message.answer('Вы еще не завершили регистрацию!')
+        return
 
-        settings_text = "📊 Ваши настройки:\n\n"
+    settings_text = "📊 Ваши настройки:\n\n"
+    
+    if user.birthday:
+        settings_text += f"🎂 Дата рождения: {user.birthday.strftime('%d.%m.%Y')}\n"
+    else:
+        settings_text += "🎂 Дата рождения: не указана\n"
         
-        if user.birthday:
-            settings_text += f"🎂 Дата рождения: {user.birthday.strftime('%d.%m.%Y')}\n"
-        else:
-            settings_text += "🎂 Дата рождения: не указана\n"
-            
-        if user.timezone and user.city:
-            timezone_message = get_timezone_message(user.city, user.timezone)
-            settings_text += f"{timezone_message}\n"
-        else:
-            settings_text += "🌍 Часовой пояс: не указан\n"
-            
-        if user.notifications_enabled:
-            settings_text += "🔔 Уведомления: включены"
-        else:
-            settings_text += "🔕 Уведомления: отключены"
+    if user.timezone and user.city:
+        timezone_message = get_timezone_message(user.city, user.timezone)
+        settings_text += f"{timezone_message}\n"
+    else:
+        settings_text += "🌍 Часовой пояс: не указан\n"
+        
+    if user.notifications_enabled:
+        settings_text += "🔔 Уведомления: включены"
+    else:
+        settings_text += "🔕 Уведомления: отключены"
 
-        await message.answer(settings_text)
+    await message.answer(settings_text)
 
 @router.message(F.text & F.text.strip().lower() == 'отключить уведомления')
 async def disable_notifications_menu(message: Message):
-    async for session in get_db():
-        result = await session.execute(select(User).where(User.user_id == message.from_user.id))
-        user = result.scalar_one_or_none()
+    user = await get_profile(message.from_user.id)
 
-        if not user:
-            await message.answer('❌ Вы еще не зарегистрированы в боте.')
-            return
+    if not user:
+        await message.answer('❌ Вы еще не зарегистрированы в боте.')
+        return
 
     await message.answer(
         '⚠️ Вы уверены, что хотите отключить уведомления?\n\n'
@@ -424,22 +342,15 @@ async def disable_notifications_menu(message: Message):
 
 @router.callback_query(F.data == 'confirm_disable_notifications')
 async def confirm_disable_notifications(callback: CallbackQuery):
-    async for session in get_db():
-        result = await session.execute(select(User).where(User.user_id == callback.from_user.id))
-        user = result.scalar_one_or_none()
-
-        if user:
-            await session.delete(user)
-            await session.commit()
-            
-            await callback.message.edit_text(
-                '✅ Уведомления отключены!\n\n'
-                '• Все ваши данные удалены из базы данных\n'
-                '• Напоминания больше не будут приходить\n'
-                '• Для использования бота нажмите /start'
-            )
-        else:
-            await callback.message.edit_text('❌ Пользователь не найден в базе данных.')
+    if await delete_user(callback.from_user.id):
+        await callback.message.edit_text(
+            '✅ Уведомления отключены!\n\n'
+            '• Все ваши данные удалены из базы данных\n'
+            '• Напоминания больше не будут приходить\n'
+            '• Для использования бота нажмите /start'
+        )
+    else:
+        await callback.message.edit_text('❌ Пользователь не найден в базе данных.')
     
     await callback.answer()
 
@@ -458,140 +369,109 @@ async def change_timezone_command(message: Message, state: FSMContext):
     await message.answer('Отправьте новый город или поделитесь геолокацией:', reply_markup=get_timezone_share_kb())
     await state.set_state(SettingsState.waiting_for_new_timezone)
 
-@router.message()
-async def fallback_handler(message: types.Message, state: FSMContext):
-    s = await state.get_state()
-    await message.answer(
-        "Я не понял команду.\n"
-        "Если вы только начали — используйте /start и следуйте инструкции.\n"
-        "Если что-то не работает — попробуйте пройти регистрацию заново или напишите /start."
-        f"\nТекущее состояние: {s}"
-    )
-
 # --- Календарь для выбора даты рождения ---
+# Все кнопки календаря разбираются одним CalendarCallback.filter(), действие ищется в таблице CALENDAR_ACTIONS
 
-@router.callback_query(F.data.startswith('cal:year:'), RegisterState.waiting_for_birthday)
-@router.callback_query(F.data.startswith('cal:year:'), SettingsState.waiting_for_new_birthday)
-async def calendar_year_handler(callback: CallbackQuery, state: FSMContext):
-    year = int(callback.data.split(':')[2])
-    await state.update_data(year=year)
-    await callback.message.edit_text(
-        f'Выберите месяц',
-        reply_markup=get_months_kb(year)
-    )
-    await callback.answer()
+BIRTHDAY_INPUT_STATES = frozenset((RegisterState.waiting_for_birthday.state, SettingsState.waiting_for_new_birthday.state))
+BIRTHDAY_CONFIRM_STATES = BIRTHDAY_INPUT_STATES | {RegisterState.confirm_birthday.state}
+YEARS_PROMPT = 'Пожалуйста, выберите год своего рождения:'
+
+
+async def calendar_year(callback: CallbackQuery, data: CalendarCallback, state: FSMContext):
+    await state.update_data(year=data.year)
+    await callback.message.edit_text('Выберите месяц', reply_markup=get_months_kb(data.year))
 
-@router.callback_query(F.data.startswith('cal:month:'), RegisterState.waiting_for_birthday)
-@router.callback_query(F.data.startswith('cal:month:'), SettingsState.waiting_for_new_birthday)
-async def calendar_month_handler(callback: CallbackQuery, state: FSMContext):
-    _, _, year, month = callback.data.split(':')
-    year = int(year)
-    month = int(month)
-    await state.update_data(month=month)
-    await callback.message.edit_text(
-        f'Выберите день',
-        reply_markup=get_days_kb(year, month)
-    )
-    await callback.answer()
 
-@router.callback_query(F.data.startswith('cal:day:'), RegisterState.waiting_for_birthday)
-@router.callback_query(F.data.startswith('cal:day:'), SettingsState.waiting_for_new_birthday)
-async def calendar_day_handler(callback: CallbackQuery, state: FSMContext):
-    _, _, year, month, day = callback.data.split(':')
-    year = int(year)
-    month = int(month)
-    day = int(day)
-    date_str = f'{day:02d}.{month:02d}.{year}'
-    await state.update_data(day=day, birthday=date_str)
+async def calendar_month(callback: CallbackQuery, data: CalendarCallback, state: FSMContext):
+    await state.update_data(month=data.month)
+    await callback.message.edit_text('Выберите день', reply_markup=get_days_kb(data.year, data.month))
+
+
+async def calendar_day(callback: CallbackQuery, data: CalendarCallback, state: FSMContext):
+    date_str = f'{data.day:02d}.{data.month:02d}.{data.year}'
+    await state.update_data(day=data.day, birthday=date_str)
     await callback.message.edit_text(
         f'Выбрана дата {date_str}',
-        reply_markup=get_confirm_kb(date_str)
+        reply_markup=get_confirm_kb(data.year, data.month, data.day)
     )
-    await callback.answer()
 
-@router.callback_query(F.data.startswith('cal:confirm:'), RegisterState.waiting_for_birthday)
-@router.callback_query(F.data.startswith('cal:confirm:'), RegisterState.confirm_birthday)
-@router.callback_query(F.data.startswith('cal:confirm:'), SettingsState.waiting_for_new_birthday)
-async def calendar_confirm_handler(callback: CallbackQuery, state: FSMContext):
-    date_str = callback.data.split(':')[2]
-    iso_date = datetime.strptime(date_str, '%d.%m.%Y').date()
-    current_state = await state.get_state()
-    if current_state == SettingsState.waiting_for_new_birthday.state:
-        async for session in get_db():
-            result = await session.execute(select(User).where(User.user_id == callback.from_user.id))
-            user = result.scalar_one_or_none()
-            if user:
-                user.birthday = iso_date
-                user.notifications_enabled = True
-            else:
-                user = User(user_id=callback.from_user.id, birthday=iso_date, notifications_enabled=True)
-                session.add(user)
-            await session.commit()
+
+async def calendar_confirm(callback: CallbackQuery, data: CalendarCallback, state: FSMContext):
+    try:
+        birthday = date(data.year, data.month, data.day)
+    except ValueError:
+        return
+    await upsert_user(callback.from_user.id, birthday=birthday, notifications_enabled=True)
+    if await state.get_state() == SettingsState.waiting_for_new_birthday.state:
         await callback.message.edit_text('Дата рождения обновлена!')
         await state.clear()
     else:
-        await state.update_data(birthday=iso_date.isoformat())
-        async for session in get_db():
-            result = await session.execute(select(User).where(User.user_id == callback.from_user.id))
-            user = result.scalar_one_or_none()
-            if user:
-                user.birthday = iso_date
-                user.notifications_enabled = True
-            else:
-                user = User(user_id=callback.from_user.id, birthday=iso_date, notifications_enabled=True)
-                session.add(user)
-            await session.commit()
+        await state.update_data(birthday=birthday.isoformat())
         await callback.message.edit_text(
             'Теперь отправьте ваш город или поделитесь геолокацией для определения часового пояса.'
         )
         await callback.message.answer('Отправьте город или поделитесь геолокацией:', reply_markup=get_timezone_share_kb())
         await state.set_state(RegisterState.waiting_for_timezone)
-    await callback.answer()
 
-# УНИВЕРСАЛЬНЫЙ обработчик для cal:change (работает в любом состоянии)
-@router.callback_query(F.data == 'cal:change')
-async def universal_calendar_change_handler(callback: CallbackQuery, state: FSMContext):
-    """Универсальный обработчик для кнопки изменения даты в любом состоянии"""
-    current_state = await state.get_state()
-    
-    if current_state == RegisterState.confirm_birthday.state:
-        await state.set_state(RegisterState.waiting_for_birthday)
-    elif current_state == SettingsState.waiting_for_new_birthday.state:
-        await state.set_state(SettingsState.waiting_for_new_birthday)
-    else:
+
+async def calendar_change(callback: CallbackQuery, data: CalendarCallback, state: FSMContext):
+    """Кнопка изменения даты работает в любом состоянии"""
+    if await state.get_state() != SettingsState.waiting_for_new_birthday.state:
         await state.set_state(RegisterState.waiting_for_birthday)
-    
-    await callback.message.edit_text('Пожалуйста, выберите год своего рождения:', reply_markup=get_years_kb(2000))
-    await callback.answer()
+    await callback.message.edit_text(YEARS_PROMPT, reply_markup=get_years_kb(2000))
 
-@router.callback_query(F.data.startswith('cal:year_prev:'))
-async def calendar_year_prev(callback: CallbackQuery, state: FSMContext):
-    page = int(callback.data.split(':')[2])
-    new_page = max(0, page - 1)
-    await callback.message.edit_text('Пожалуйста, выберите год своего рождения:', reply_markup=get_years_kb(new_page))
-    await callback.answer()
 
-@router.callback_query(F.data.startswith('cal:year_next:'))
-async def calendar_year_next(callback: CallbackQuery, state: FSMContext):
-    page = int(callback.data.split(':')[2])
-    new_page = page + 1
-    await callback.message.edit_text('Пожалуйста, выберите год своего рождения:', reply_markup=get_years_kb(new_page))
-    await callback.answer()
+async def calendar_prev_years(callback: CallbackQuery, data: CalendarCallback, state: FSMContext):
+    await callback.message.edit_text(YEARS_PROMPT, reply_markup=get_years_kb(max(0, data.page - 1)))
 
-@router.callback_query(F.data == 'cal:back_to_years')
-async def calendar_back_to_years(callback: CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    year = data.get('year')
-    from bot.calendar import START_YEAR, YEARS_PER_PAGE
-    if year:
-        page = (int(year) - START_YEAR) // YEARS_PER_PAGE
-    else:
-        page = 0
-    await callback.message.edit_text('Пожалуйста, выберите год своего рождения:', reply_markup=get_years_kb(page))
+
+async def calendar_next_years(callback: CallbackQuery, data: CalendarCallback, state: FSMContext):
+    await callback.message.edit_text(YEARS_PROMPT, reply_markup=get_years_kb(data.page + 1))
+
+
+async def calendar_back_to_years(callback: CallbackQuery, data: CalendarCallback, state: FSMContext):
+    page = (data.year - START_YEAR) // YEARS_PER_PAGE if data.year else 0
+    await callback.message.edit_text(YEARS_PROMPT, reply_markup=get_years_kb(page))
+
+
+async def calendar_back_to_months(callback: CallbackQuery, data: CalendarCallback, state: FSMContext):
+    await callback.message.edit_text('Выберите месяц', reply_markup=get_months_kb(data.year))
+
+
+async def calendar_noop(callback: CallbackQuery, data: CalendarCallback, state: FSMContext):
+    pass
+
+
+# Действие -> (обработчик, состояния FSM, в которых оно допустимо; None — в любом)
+CALENDAR_ACTIONS = {
+    CalendarAction.YEAR: (calendar_year, BIRTHDAY_INPUT_STATES),
+    CalendarAction.MONTH: (calendar_month, BIRTHDAY_INPUT_STATES),
+    CalendarAction.DAY: (calendar_day, BIRTHDAY_INPUT_STATES),
+    CalendarAction.CONFIRM: (calendar_confirm, BIRTHDAY_CONFIRM_STATES),
+    CalendarAction.CHANGE: (calendar_change, None),
+    CalendarAction.PREV_YEARS: (calendar_prev_years, None),
+    CalendarAction.NEXT_YEARS: (calendar_next_years, None),
+    CalendarAction.BACK_TO_YEARS: (calendar_back_to_years, None),
+    CalendarAction.BACK_TO_MONTHS: (calendar_back_to_months, None),
+    CalendarAction.NOOP: (calendar_noop, None),
+}
+
+
+@router.callback_query(CalendarCallback.filter())
+async def calendar_handler(callback: CallbackQuery, callback_data: CalendarCallback, state: FSMContext):
+    handler, states = CALENDAR_ACTIONS[callback_data.action]
+    if states is None or await state.get_state() in states:
+        await handler(callback, callback_data, state)
     await callback.answer()
 
-@router.callback_query(F.data.startswith('cal:back_to_months:'))
-async def calendar_back_to_months(callback: CallbackQuery, state: FSMContext):
-    year = int(callback.data.split(':')[2])
-    await callback.message.edit_text('Выберите месяц', reply_markup=get_months_kb(year))
-    await callback.answer()
\ No newline at end of file
+
+# Должен регистрироваться последним среди обработчиков сообщений
+@router.message()
+async def fallback_handler(message: types.Message, state: FSMContext):
+    s = await state.get_state()
+    await message.answer(
+        "Я не понял команду.\n"
+        "Если вы только начали — используйте /start и следуйте инструкции.\n"
+        "Если что-то не работает — попробуйте пройти регистрацию заново или напишите /start."
+        f"\nТекущее состояние: {s}"
+    )
@@ -1,49 +1,184 @@
 import logging
-from datetime import datetime, time
+from datetime import datetime, timedelta
+from functools import lru_cache
 import pytz
-from aiogram import Bot
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from bot.birthdays import days_until_birthday_batch
 from bot.db.database import Session
 from bot.db.users.models import User
-from sqlalchemy import select
+from bot.messages import COUNTDOWN_TEXTS
+from bot.metrics import scheduler_events, scheduler_run_seconds, timed
+from bot.outbox import enqueue, purge_outbox
+from bot.sharding import get_shard_clause, lease_manager
+from config import settings
+from sqlalchemy import select, update, or_
 
 logger = logging.getLogger(__name__)
 
-async def send_birthday_countdown(bot: Bot):
-    async with Session() as session:
-        try:
-            result = await session.execute(
-                select(User).where(User.birthday != None, User.timezone != None)
-            )
-            users = result.scalars().all()
-            
-            for user in users:
+# Размер пачки для массовой отметки доставленных уведомлений
+LEDGER_BATCH_SIZE = 1000
+
+
+def get_window_start(now_utc: datetime) -> datetime:
+    """Начало минуты (UTC), в которую попадает now_utc."""
+    return now_utc.astimezone(pytz.utc).replace(second=0, microsecond=0)
+
+
+@lru_cache(maxsize=4)
+def get_due_timezones(window_start: datetime) -> dict:
+    """Локальная дата -> IANA-зоны, в которых для window_start идёт первый notify_window_minutes час суток.
+
+    Зона также считается пришедшей, если её локальная дата сменилась за последние notify_window_minutes:
+    в зонах, где переход на летнее время пропускает полночь (Asia/Beirut, America/Havana),
+    локальное время в этот день не попадает в окно 00:00..notify_window_minutes.
+    Смещения считаются один раз на каждую уникальную пару UTC-смещений, результат кэшируется на окно.
+    Зоны с разницей в 24 часа (Pacific/Kiritimati и Pacific/Honolulu) попадают в разные даты.
+    """
+    previous_start = window_start - timedelta(minutes=settings.notify_window_minutes)
+    offsets = {}
+    due = {}
+    for name in pytz.all_timezones:
+        tz = pytz.timezone(name)
+        key = (window_start.astimezone(tz).utcoffset(), previous_start.astimezone(tz).utcoffset())
+        if key not in offsets:
+            offset, previous_offset = key
+            local = window_start + offset
+            in_window = local.hour * 60 + local.minute < settings.notify_window_minutes
+            date_changed = local.date() > (previous_start + previous_offset).date()
+            offsets[key] = local.date() if in_window or date_changed else None
+        local_date = offsets[key]
+        if local_date:
+            due.setdefault(local_date, []).append(name)
+    return {local_date: tuple(zones) for local_date, zones in due.items()}
+
+
+async def mark_notified(session, payloads: dict, local_date) -> set:
+    """Условно отмечает уведомление за local_date, ставит его в outbox и возвращает занятые id.
+
+    Пачка обновляется одним UPDATE; если часть строк уже занял другой процесс,
+    пачка перепроверяется построчно, чтобы не поставить уведомление в очередь дважды.
+    Отметка и постановка в outbox коммитятся вместе, поэтому падение не теряет уведомления.
+    """
+    not_notified = or_(User.last_notified_date == None, User.last_notified_date < local_date)
+    user_ids = list(payloads)
+    claimed = set()
+    for i in range(0, len(user_ids), LEDGER_BATCH_SIZE):
+        batch = user_ids[i:i + LEDGER_BATCH_SIZE]
+        result = await session.execute(
+            update(User)
+            .where(User.user_id.in_(batch), not_notified)
+            .values(last_notified_date=local_date)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(batch):
+            await session.rollback()
+            won = []
+            for user_id in batch:
+                result = await session.execute(
+                    update(User)
+                    .where(User.user_id == user_id, not_notified)
+                    .values(last_notified_date=local_date)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount:
+                    won.append(user_id)
+            batch = won
+        await enqueue(session, [(user_id, local_date, payloads[user_id]) for user_id in batch])
+        await session.commit()
+        claimed.update(batch)
+    return claimed
+
+
+def build_due_query(local_date, zone: str, shard_clause=None, after_user_id=None, limit=None):
+    """Страница получателей зоны за local_date по возрастанию user_id; обслуживается индексом ix_users_due."""
+    query = select(User.user_id, User.birthday).where(
+        User.notifications_enabled == True,
+        User.timezone == zone,
+        or_(User.last_notified_date == None, User.last_notified_date < local_date),
+        User.birthday != None,
+    )
+    if after_user_id is not None:
+        query = query.where(User.user_id > after_user_id)
+    if shard_clause is not None:
+        query = query.where(shard_clause)
+    return query.order_by(User.user_id).limit(limit)
+
+
+async def claim_due_users(session, local_date, zones, shard_clause=None) -> int:
+    """Ставит в outbox уведомления пользователям, ещё не получившим их за local_date.
+
+    Пользователи читаются страницами по settings.scheduler_chunk_size (keyset по user_id внутри зоны),
+    каждая страница обрабатывается и коммитится до чтения следующей — память не растёт с числом пользователей.
+    Строки блокируются через SELECT ... FOR UPDATE SKIP LOCKED, поэтому параллельные запуски
+    (в том числе в других процессах) не получат одних и тех же пользователей.
+    """
+    chunk_size = settings.scheduler_chunk_size
+    enqueued = 0
+    for zone in zones:
+        after_user_id = None
+        while True:
+            query = build_due_query(local_date, zone, shard_clause, after_user_id, chunk_size)
+            result = await session.execute(query.with_for_update(skip_locked=True))
+            users = result.all()
+            scheduler_events.inc('users_scanned', len(users))
+            if not users:
+                await session.commit()
+                break
+            days_left = days_until_birthday_batch([user.birthday for user in users], local_date)
+            payloads = {user.user_id: COUNTDOWN_TEXTS[days] for user, days in zip(users, days_left.tolist())}
+            enqueued += len(await mark_notified(session, payloads, local_date))
+            if len(users) < chunk_size:
+                break
+            after_user_id = users[-1].user_id
+    return enqueued
+
+
+async def enqueue_birthday_countdown():
+    """Тик планировщика: только ставит уведомления в outbox, отправкой занимается OutboxSender."""
+    due = get_due_timezones(get_window_start(datetime.now(pytz.utc)))
+    if not due:
+        return
+
+    shard_clause = get_shard_clause()
+    enqueued = 0
+    scheduler_events.inc('runs')
+    with timed(scheduler_run_seconds, 'scheduler'):
+        async with Session() as session:
+            for local_date, zones in due.items():
                 try:
-                    tz = pytz.timezone(user.timezone)
-                    now = datetime.now(tz)
-                    birthday = user.birthday
-                    next_birthday = birthday.replace(year=now.year)
-                    if next_birthday < now.date():
-                        next_birthday = next_birthday.replace(year=now.year + 1)
-                    days_left = (next_birthday - now.date()).days
-
-                    # Отправка ровно в 00:00 по локальному времени пользователя
-                    if now.hour == 0 and now.minute < 5:
-                        await bot.send_message(
-                            user.user_id,
-                            f'🎉 До вашего дня рождения осталось <b>{days_left}</b> дней!',
-                            parse_mode='HTML'
-                        )
-                        logger.info(f'Уведомление отправлено user_id={user.user_id}, days_left={days_left}')
+                    enqueued += await claim_due_users(session, local_date, zones, shard_clause)
                 except Exception as e:
-                    logger.error(f'Ошибка при отправке уведомления user_id={user.user_id}: {e}', exc_info=True)
-        except Exception as e:
-            logger.error(f'Ошибка при выборке пользователей: {e}', exc_info=True)
+                    await session.rollback()
+                    scheduler_events.inc('errors')
+                    logger.error(f'Ошибка при постановке уведомлений в очередь: {e}', exc_info=True)
+    scheduler_events.inc('enqueued', enqueued)
+
+    if enqueued:
+        logger.info(f'Поставлено в очередь уведомлений: {enqueued}')
 
-def setup_scheduler(bot: Bot):
+def setup_scheduler(fsm_storage=None):
     scheduler = AsyncIOScheduler()
-    # Запуск каждые 5 минут, чтобы не пропустить 00:00 в любом часовом поясе
-    scheduler.add_job(send_birthday_countdown, CronTrigger(minute='*/5', hour='*'), args=[bot])
+    # Повторные и пропущенные запуски безопасны: доставку за день отмечает last_notified_date
+    scheduler.add_job(
+        enqueue_birthday_countdown,
+        CronTrigger(minute=f'*/{settings.notify_interval_minutes}', hour='*'),
+        coalesce=True,
+        max_instances=1,
+        misfire_grace_time=settings.notify_window_minutes * 60,
+    )
+    if settings.shard_mode == 'lease':
+        # Аренда продлевается с запасом: три heartbeat за время жизни аренды
+        scheduler.add_job(
+            lease_manager.heartbeat,
+            'interval',
+            seconds=settings.shard_lease_ttl_seconds // 3,
+            next_run_time=datetime.now(),
+        )
+    # Чистка отправленных и dead-letter строк outbox старше settings.outbox_retention_days
+    scheduler.add_job(purge_outbox, 'interval', hours=1, next_run_time=datetime.now())
+    if hasattr(fsm_storage, 'purge_expired'):
+        # Чистка брошенных регистраций из SQL-хранилища FSM
+        scheduler.add_job(fsm_storage.purge_expired, 'interval', hours=1)
     scheduler.start()
     logger.info('Планировщик ежедневных уведомлений запущен.')
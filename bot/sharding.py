@@ -0,0 +1,144 @@
+import logging
+import math
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select, update, or_, false
+
+from bot.db.database import Session, get_insert
+from bot.db.leases.models import SchedulerLease, SchedulerInstance
+from bot.db.users.models import User
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseManager:
+    """Распределение партиций пользователей (user_id % N) между инстансами через аренду в БД.
+
+    Каждый инстанс продлевает свои аренды по heartbeat и забирает свободные или просроченные
+    партиции до честной доли N / число живых инстансов. Если инстанс умер, его аренды
+    истекают и партиции переходят к остальным; при появлении нового инстанса лишние отдаются.
+    """
+
+    def __init__(self, partitions: int, ttl: timedelta, owner: str):
+        self.partitions = partitions
+        self.ttl = ttl
+        self.owner = owner
+        self.owned = frozenset()
+        self._initialized = False
+
+    async def _ensure_partitions(self, session):
+        insert = get_insert(session.bind.dialect.name)
+        rows = [{'partition': p} for p in range(self.partitions)]
+        stmt = insert(SchedulerLease).values(rows)
+        if session.bind.dialect.name == 'mysql':
+            stmt = stmt.prefix_with('IGNORE')
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[SchedulerLease.partition])
+        await session.execute(stmt)
+        await session.commit()
+
+    async def heartbeat(self):
+        try:
+            async with Session() as session:
+                if not self._initialized:
+                    await self._ensure_partitions(session)
+                    self._initialized = True
+                self.owned = frozenset(await self._rebalance(session))
+        except Exception as e:
+            logger.error(f'Ошибка продления аренды партиций: {e}', exc_info=True)
+            self.owned = frozenset()
+            return
+        logger.info(f'Партиции инстанса {self.owner}: {sorted(self.owned)}')
+
+    async def _register_instance(self, session, expires_at: datetime):
+        insert = get_insert(session.bind.dialect.name)
+        stmt = insert(SchedulerInstance).values(owner=self.owner, expires_at=expires_at)
+        if session.bind.dialect.name == 'mysql':
+            stmt = stmt.on_duplicate_key_update(expires_at=expires_at)
+        else:
+            stmt = stmt.on_conflict_do_update(index_elements=[SchedulerInstance.owner], set_={'expires_at': expires_at})
+        await session.execute(stmt)
+        await session.execute(delete(SchedulerInstance).where(SchedulerInstance.expires_at < datetime.utcnow() - self.ttl))
+
+    async def _rebalance(self, session) -> set:
+        now = datetime.utcnow()
+        expires_at = now + self.ttl
+        alive = SchedulerLease.expires_at > now
+
+        await self._register_instance(session, expires_at)
+        await session.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.owner == self.owner, alive)
+            .values(expires_at=expires_at)
+        )
+        owners = set((await session.execute(
+            select(SchedulerInstance.owner).where(SchedulerInstance.expires_at > now)
+        )).scalars())
+        owners.add(self.owner)
+        target = math.ceil(self.partitions / len(owners))
+
+        owned = set((await session.execute(
+            select(SchedulerLease.partition).where(SchedulerLease.owner == self.owner, alive)
+        )).scalars())
+        if len(owned) > target:
+            extra = sorted(owned)[target:]
+            await session.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.partition.in_(extra), SchedulerLease.owner == self.owner)
+                .values(owner=None, expires_at=None)
+            )
+            owned -= set(extra)
+        elif len(owned) < target:
+            free = (await session.execute(
+                select(SchedulerLease.partition)
+                .where(or_(SchedulerLease.owner == None, SchedulerLease.expires_at == None, SchedulerLease.expires_at <= now))
+                .limit(target - len(owned))
+            )).scalars().all()
+            for partition in free:
+                # Условный UPDATE: если партицию одновременно забрал другой инстанс, rowcount будет 0
+                result = await session.execute(
+                    update(SchedulerLease)
+                    .where(
+                        SchedulerLease.partition == partition,
+                        or_(SchedulerLease.owner == None, SchedulerLease.expires_at == None, SchedulerLease.expires_at <= now),
+                    )
+                    .values(owner=self.owner, expires_at=expires_at)
+                )
+                if result.rowcount:
+                    owned.add(partition)
+        await session.commit()
+        return owned
+
+    async def release(self):
+        """Освобождает партиции при остановке, чтобы их сразу забрали другие инстансы."""
+        async with Session() as session:
+            await session.execute(
+                update(SchedulerLease).where(SchedulerLease.owner == self.owner).values(owner=None, expires_at=None)
+            )
+            await session.execute(delete(SchedulerInstance).where(SchedulerInstance.owner == self.owner))
+            await session.commit()
+        self.owned = frozenset()
+
+
+def get_instance_id() -> str:
+    return settings.shard_instance_id or f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}'
+
+
+lease_manager = LeaseManager(
+    settings.shard_partitions, timedelta(seconds=settings.shard_lease_ttl_seconds), get_instance_id()
+)
+
+
+def get_shard_clause():
+    """Условие на users, ограничивающее рассылку долей текущего инстанса (None — без шардирования)."""
+    if settings.shard_mode == 'static':
+        return (User.user_id % settings.shard_count) == settings.shard_index
+    if settings.shard_mode == 'lease':
+        if not lease_manager.owned:
+            return false()
+        return (User.user_id % settings.shard_partitions).in_(sorted(lease_manager.owned))
+    return None
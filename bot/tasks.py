@@ -0,0 +1,25 @@
+import asyncio
+import logging
+from typing import Coroutine, Optional
+
+logger = logging.getLogger(__name__)
+
+# Event loop держит на задачи только слабые ссылки: без этого множества незавершённую задачу может собрать GC
+_background_tasks = set()
+
+
+def _on_done(task: asyncio.Task):
+    _background_tasks.discard(task)
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None:
+        logger.error(f'Фоновая задача {task.get_name()} завершилась с ошибкой: {error}', exc_info=error)
+
+
+def spawn(coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+    """create_task для фоновой работы: ссылка хранится до завершения, исключение сразу пишется в лог."""
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_done)
+    return task
@@ -0,0 +1,92 @@
+import asyncio
+import hmac
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def check_webhook_settings():
+    """Режим вебхука не запускается без URL и секрета.
+
+    Без секрета любой, кто узнал адрес, может присылать поддельные апдейты от имени любого пользователя.
+    """
+    missing = [name.upper() for name in ('webhook_url', 'webhook_secret') if not getattr(settings, name)]
+    if missing:
+        raise RuntimeError(f'Для режима вебхука задайте {", ".join(missing)}')
+
+
+def create_app(dp: Dispatcher, bot: Bot) -> web.Application:
+    """aiohttp-приложение, принимающее апдейты Telegram на settings.webhook_path.
+
+    Апдейт обрабатывается в фоне, ответ Telegram отдаётся сразу. Число одновременно
+    обрабатываемых апдейтов ограничено; при исчерпании лимита запрос ждёт свободный слот,
+    и Telegram сам притормаживает доставку.
+    """
+    if not settings.webhook_secret:
+        raise RuntimeError('Для режима вебхука задайте WEBHOOK_SECRET')
+    # Сравниваются байты: compare_digest не принимает строки с не-ASCII символами
+    secret = settings.webhook_secret.encode()
+    semaphore = asyncio.Semaphore(settings.webhook_max_concurrency)
+    tasks = set()
+
+    async def process(update: Update):
+        try:
+            await dp.feed_update(bot, update)
+        except Exception as e:
+            logger.error(f'Ошибка при обработке апдейта {update.update_id}: {e}', exc_info=True)
+        finally:
+            semaphore.release()
+
+    async def handle(request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, '').encode(), secret):
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={'bot': bot})
+        except Exception:
+            return web.Response(status=400)
+
+        await semaphore.acquire()
+        task = asyncio.create_task(process(update))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return web.Response()
+
+    async def drain(app: web.Application):
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    app = web.Application()
+    app.router.add_post(settings.webhook_path, handle)
+    app.on_shutdown.append(drain)
+    return app
+
+
+async def run_webhook_server(dp: Dispatcher, bot: Bot):
+    """Запускает HTTP-сервер вебхука и работает до отмены.
+
+    При нескольких воркерах порт открывается с SO_REUSEPORT, и ядро распределяет
+    соединения между процессами.
+    """
+    app = create_app(dp, bot)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(
+        runner, settings.webhook_host, settings.webhook_port, reuse_port=settings.webhook_workers > 1
+    )
+    await dp.emit_startup(bot=bot)
+    await site.start()
+    logger.info(f'Вебхук слушает {settings.webhook_host}:{settings.webhook_port}{settings.webhook_path}')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -7,6 +9,100 @@ class Settings(BaseSettings):
     bot_token: str = "your bot token"
     exp_time_minutes: int = 30
 
+    # Движок БД: пул соединений, проверка соединений, таймаут запросов (MySQL/PostgreSQL), логирование SQL
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0
+    db_pool_pre_ping: bool = True
+    db_pool_recycle: int = 1800
+    db_statement_timeout_ms: Optional[int] = None
+    db_echo: bool = False
+    db_query_timing: bool = True
+    # Применять миграции схемы при старте бота (иначе: python -m bot.db.migrations)
+    db_auto_migrate: bool = True
+
+    # Планировщик: период запуска и окно после локальной полуночи, в которое уведомление ещё отправляется
+    notify_interval_minutes: int = 5
+    notify_window_minutes: int = 60
+    # Сколько пользователей планировщик читает из БД за один запрос (keyset-пагинация по user_id)
+    scheduler_chunk_size: int = 1000
+
+    # Шардирование рассылки между инстансами: none, static (user_id % shard_count == shard_index)
+    # или lease (партиции user_id % shard_partitions распределяются арендой в БД)
+    shard_mode: str = "none"
+    shard_index: int = 0
+    shard_count: int = 1
+    shard_partitions: int = 64
+    shard_lease_ttl_seconds: int = 90
+    shard_instance_id: Optional[str] = None
+
+    # Рассылка уведомлений (лимиты Telegram: ~30 сообщений/с на бота, 1 сообщение/с в чат)
+    broadcast_workers: int = 16
+    broadcast_rate: float = 25.0
+    broadcast_chat_interval: float = 1.0
+    broadcast_max_retries: int = 3
+
+    # Геокодирование (Nominatim)
+    nominatim_url: str = "https://nominatim.openstreetmap.org"
+    geocoder_timeout: float = 5.0
+    geocoder_pool_size: int = 10
+    geocoder_max_concurrency: int = 4
+    # False — данные TimezoneFinder читаются из файлов по мере надобности, True — целиком в памяти
+    tzfinder_in_memory: bool = False
+    # Кэш геокодирования: размер LRU в памяти, точность сетки координат (знаков после запятой), хранение в БД
+    geocache_size: int = 10000
+    geocache_grid_precision: int = 2
+    geocache_persistent: bool = False
+    # Офлайн-справочник городов (путь к собственной сборке scripts/build_gazetteer.py, порог нечёткого поиска)
+    gazetteer_enabled: bool = True
+    gazetteer_path: Optional[str] = None
+    gazetteer_fuzzy_cutoff: float = 0.8
+
+    # Кэш профилей пользователей: memory (в процессе) или redis (общий для нескольких процессов, нужен пакет redis)
+    user_cache_backend: str = "memory"
+    user_cache_ttl: int = 300
+    user_cache_size: int = 100000
+    redis_url: str = "redis://localhost:6379/0"
+
+    # Хранилище FSM: memory (в процессе), sql (таблица fsm_states, один процесс) или redis (несколько процессов);
+    # TTL брошенных регистраций
+    fsm_storage: str = "memory"
+    fsm_state_ttl_hours: int = 24
+
+    # Режим работы: polling или webhook (HTTP-сервер на aiohttp, несколько процессов на одном порту)
+    run_mode: str = "polling"
+    webhook_url: Optional[str] = None
+    webhook_path: str = "/webhook"
+    webhook_secret: Optional[str] = None
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_workers: int = 1
+    webhook_max_concurrency: int = 100
+    # Быстрый старт: планировщик, outbox, метрики, команды и прогрев поднимаются в фоне после начала приёма апдейтов
+    fast_startup: bool = False
+    # Адрес Bot API (локальный telegram-bot-api server); по умолчанию api.telegram.org
+    telegram_api_url: Optional[str] = None
+
+    # Очередь исходящих уведомлений (outbox): отправители, размер пачки, повторы с экспоненциальной задержкой
+    outbox_workers: int = 2
+    # Сколько процессов во всём развёртывании отправляют outbox (реплики с shard_mode); лимит Telegram общий на токен,
+    # поэтому broadcast_rate делится между ними. В одном процессе отправитель запускается только вместе с планировщиком
+    outbox_instances: int = 1
+    outbox_batch_size: int = 500
+    outbox_poll_interval: float = 5.0
+    outbox_max_attempts: int = 5
+    outbox_retry_base_seconds: int = 30
+    outbox_visibility_timeout: int = 300
+    # Сколько дней хранить отправленные и dead-letter строки outbox (чистка раз в час в процессе планировщика)
+    outbox_retention_days: int = 7
+    # Выключать уведомления пользователям, которые заблокировали бота или удалили аккаунт
+    prune_unreachable_users: bool = True
+
+    # Метрики: порт HTTP-эндпоинта /metrics (воркер вебхука N слушает порт + N) и период сводки в логе
+    metrics_port: Optional[int] = None
+    metrics_host: str = "0.0.0.0"
+    metrics_log_interval_minutes: int = 0
+
     model_config = SettingsConfigDict(env_file=".env")
 
 
@@ -1,14 +1,28 @@
 import asyncio
+import multiprocessing
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from dotenv import load_dotenv
 import os
 import logging
+import signal
 from bot.routes import router
 from bot.scheduler import setup_scheduler
 from aiogram.types import BotCommand
-from bot.scheduler import send_birthday_countdown
 
-from bot.db.database import create_db, Session
+from sqlalchemy import text
+from bot.db.database import dispose_engine, Session
+from bot.db.migrations import migrate
+from bot.geo import close_session, get_session, warm_up_timezone_finder
+from bot.gazetteer import load_gazetteer
+from bot.fsm_storage import create_fsm_storage
+from bot.webhook import check_webhook_settings, run_webhook_server
+from bot.sharding import lease_manager
+from bot.outbox import OutboxSender
+from bot.tasks import spawn
+from bot.instrumentation import MetricsMiddleware, TelegramTimingMiddleware, start_metrics
+from config import settings
 
 load_dotenv()
 API_TOKEN = os.getenv('BOT_TOKEN')
@@ -16,18 +30,72 @@ API_TOKEN = os.getenv('BOT_TOKEN')
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
-bot = Bot(token=API_TOKEN)
-dp = Dispatcher()
+# TELEGRAM_API_URL — локальный Bot API server (или фейковый сервер в bench.startup)
+api_session = AiohttpSession(api=TelegramAPIServer.from_base(settings.telegram_api_url)) if settings.telegram_api_url else None
+bot = Bot(token=API_TOKEN, session=api_session)
+bot.session.middleware(TelegramTimingMiddleware())
+router.message.middleware(MetricsMiddleware())
+router.callback_query.middleware(MetricsMiddleware())
+fsm_storage, fsm_isolation = create_fsm_storage()
+dp = Dispatcher(storage=fsm_storage, events_isolation=fsm_isolation)
 dp.include_router(router)
+dp.shutdown.register(close_session)
+outbox_sender = OutboxSender(bot)
+dp.shutdown.register(outbox_sender.stop)
+if settings.shard_mode == 'lease':
+    dp.shutdown.register(lease_manager.release)
+# Схема БД готова: в быстром режиме миграции идут в фоне параллельно с запуском polling
+schema_ready = asyncio.Event()
 
-async def main():
-    logger.info('Запуск BirthdayBot...')
-    logger.info(f'Токен: {API_TOKEN[:6]}***... (скрыт)')
-    
-    # await create_db()
-    logger.info('✅ Таблицы БД инициализированы.')
+async def wait_for_schema(handler, event, data):
+    # Апдейт, пришедший до конца миграций, ждёт их, а не падает на отсутствующей таблице
+    await schema_ready.wait()
+    return await handler(event, data)
+
+if settings.fast_startup:
+    dp.update.outer_middleware(wait_for_schema)
 
-    setup_scheduler(bot)
+async def on_startup(run_scheduler: bool = True, run_migrations: bool = True, worker: int = 0):
+    if settings.fast_startup:
+        # Приём апдейтов начинается сразу, миграции и остальное поднимаются в фоне
+        spawn(start_background(run_scheduler, worker, run_migrations), name='start_background')
+    else:
+        await start_background(run_scheduler, worker, run_migrations)
+
+async def start_background(run_scheduler: bool, worker: int, run_migrations: bool = True):
+    if run_migrations and settings.db_auto_migrate:
+        try:
+            await migrate()
+        except Exception as e:
+            if not settings.fast_startup:
+                raise
+            # Без схемы бот работать не может: останавливаемся, как при ошибке миграций в обычном режиме
+            logger.critical(f'Миграции не применены, бот останавливается: {e}', exc_info=True)
+            os.kill(os.getpid(), signal.SIGTERM)
+            return
+        logger.info('✅ Схема БД актуальна.')
+    schema_ready.set()
+
+    if run_scheduler:
+        setup_scheduler(fsm_storage)
+        # Один отправитель на процесс с планировщиком: у каждого отправителя свой TokenBucket на broadcast_rate
+        outbox_sender.start()
+    await start_metrics(worker)
+    spawn(warm_up(), name='warm_up')
+
+async def warm_up():
+    """Прогрев ленивых зависимостей, чтобы первые пользователи не ждали их создания."""
+    try:
+        get_session()
+        async with Session() as session:
+            await session.execute(text('SELECT 1'))
+        if settings.gazetteer_enabled:
+            await load_gazetteer()
+        await warm_up_timezone_finder()
+    except Exception as e:
+        logger.warning(f'Прогрев не завершён: {e}')
+
+async def set_commands():
     await bot.set_my_commands([
         BotCommand(command='menu', description='Главное меню'),
         BotCommand(command='start', description='Начать регистрацию'),
@@ -35,10 +103,70 @@ async def main():
         BotCommand(command='help', description='Помощь по боту')
     ])
 
+async def main():
+    logger.info('Запуск BirthdayBot...')
+    logger.info(f'Токен: {API_TOKEN[:6]}***... (скрыт)')
+    
+    await on_startup()
+    if settings.fast_startup:
+        spawn(set_commands(), name='set_commands')
+    else:
+        await set_commands()
+
     logger.info('Бот успешно запущен. Ожидание событий...')
+    await bot.delete_webhook()
     await dp.start_polling(bot)
 
+async def serve_webhook(worker: int):
+    # Планировщик и отправитель outbox запускаются только в первом воркере, миграции уже применены в register_webhook
+    await on_startup(run_scheduler=worker == 0, run_migrations=False, worker=worker)
+    logger.info(f'Воркер вебхука #{worker} запущен.')
+    await run_webhook_server(dp, bot)
+
+def run_webhook_worker(worker: int):
+    asyncio.run(serve_webhook(worker))
+
+async def register_webhook():
+    if settings.db_auto_migrate:
+        await migrate()
+        # Соединения пула привязаны к этому event loop, воркеры откроют свои
+        await dispose_engine()
+    await bot.set_webhook(
+        f'{settings.webhook_url}{settings.webhook_path}',
+        secret_token=settings.webhook_secret,
+        drop_pending_updates=False,
+    )
+    await set_commands()
+    await bot.session.close()
+
+def run_webhook():
+    logger.info('Запуск BirthdayBot в режиме вебхука...')
+    check_webhook_settings()
+    if settings.webhook_workers > 1 and settings.fsm_storage != 'redis':
+        # sql-хранилище блокирует апдейты пользователя только внутри процесса: записи из разных воркеров теряются
+        logger.warning(f'FSM {settings.fsm_storage} не изолирует апдейты между воркерами: используйте fsm_storage=redis.')
+    if settings.webhook_workers > 1 and settings.user_cache_backend == 'memory':
+        # Инвалидация доходит только до воркера, который записал изменение (в том числе отключение из outbox)
+        logger.warning(
+            f'Кэш профилей в памяти не разделяется между воркерами: остальные воркеры до {settings.user_cache_ttl} с '
+            'видят старые дату, часовой пояс и настройку уведомлений. Используйте user_cache_backend=redis.'
+        )
+    asyncio.run(register_webhook())
+
+    if settings.webhook_workers == 1:
+        run_webhook_worker(0)
+        return
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=run_webhook_worker, args=(i,)) for i in range(settings.webhook_workers)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+
 if __name__ == '__main__':
-    asyncio.run(main())
+    if settings.run_mode == 'webhook':
+        run_webhook()
+    else:
+        asyncio.run(main())
 
-#main file
\ No newline at end of file
+#main file
@@ -0,0 +1,64 @@
+"""Сборка офлайн-справочника городов для bot/gazetteer.py из выгрузки GeoNames.
+
+Запуск:
+    python scripts/build_gazetteer.py cities15000.txt -o bot/data/cities.tsv
+
+cities15000.txt (или cities5000/cities1000) берётся с https://download.geonames.org/export/dump/.
+В индекс попадают основное название и альтернативные названия на латинице и кириллице.
+Результат — TSV (key, city, lat, lon, tz), отсортированный по key; при совпадении ключей
+остаётся самый крупный город.
+"""
+import argparse
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bot.gazetteer import normalize_city
+
+ALIAS_RE = re.compile(r"^[A-Za-zÀ-ÿА-Яа-яЁёІіЇїЄєҐґ .'’-]+$")
+
+
+def read_geonames(path: Path, min_population: int):
+    """Записи (population, names, display_name, lat, lon, tz) из файла GeoNames."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            cols = line.rstrip('\n').split('\t')
+            population = int(cols[14] or 0)
+            if population < min_population:
+                continue
+            names = [cols[1], cols[2]] + [a for a in cols[3].split(',') if ALIAS_RE.match(a)]
+            cyrillic = [a for a in names if re.search('[А-Яа-я]', a)]
+            display = cyrillic[0] if cyrillic else cols[1]
+            yield population, names, display, float(cols[4]), float(cols[5]), cols[17]
+
+
+def write_index(entries, path: Path):
+    """entries: (population, names, display_name, lat, lon, tz)."""
+    index = {}
+    for population, names, display, lat, lon, tz in sorted(entries, key=lambda e: -e[0]):
+        for name in names:
+            key = normalize_city(name)
+            if key and key not in index:
+                index[key] = (display, lat, lon, tz)
+    with open(path, 'w', encoding='utf-8') as f:
+        for key in sorted(index):
+            display, lat, lon, tz = index[key]
+            f.write(f'{key}\t{display}\t{lat:.4f}\t{lon:.4f}\t{tz}\n')
+    return len(index)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('source', type=Path, help='файл GeoNames citiesNNNN.txt')
+    parser.add_argument('-o', '--output', type=Path, default=Path('bot/data/cities.tsv'))
+    parser.add_argument('--min-population', type=int, default=15000)
+    args = parser.parse_args()
+
+    count = write_index(read_geonames(args.source, args.min_population), args.output)
+    print(f'{args.output}: {count} названий')
+
+
+if __name__ == '__main__':
+    main()
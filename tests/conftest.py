@@ -0,0 +1,15 @@
+import asyncio
+
+import pytest
+
+from bot.db import database
+from config import settings
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """Отдельная база SQLite на тест: движок создаётся заново по временному SQLALCHEMY_URI."""
+    monkeypatch.setattr(settings, 'sqlalchemy_uri', f'sqlite+aiosqlite:///{tmp_path / "bot.db"}')
+    monkeypatch.setattr(database, '_engine', None)
+    yield
+    asyncio.run(database.dispose_engine())
@@ -0,0 +1,57 @@
+from datetime import date, timedelta
+
+import pytest
+
+from bot.birthdays import birthday_in_year, days_since_birthday, days_until_birthday, days_until_birthday_batch
+
+LEAP_BIRTHDAY = date(2000, 2, 29)
+
+
+@pytest.mark.parametrize('year, expected', [
+    (2023, date(2023, 2, 28)),
+    (2024, date(2024, 2, 29)),
+    (2100, date(2100, 2, 28)),  # кратный 100, но не 400 — невисокосный
+    (2400, date(2400, 2, 29)),
+])
+def test_birthday_in_year_feb_29(year, expected):
+    assert birthday_in_year(LEAP_BIRTHDAY, year) == expected
+
+
+def test_birthday_in_year_regular_date():
+    assert birthday_in_year(date(1990, 12, 31), 2025) == date(2025, 12, 31)
+
+
+@pytest.mark.parametrize('birthday, today, until, since', [
+    # День рождения сегодня
+    (date(1990, 5, 17), date(2025, 5, 17), 0, 0),
+    (LEAP_BIRTHDAY, date(2024, 2, 29), 0, 0),
+    (LEAP_BIRTHDAY, date(2023, 2, 28), 0, 0),
+    # 29 февраля: в невисокосный год отмечается 28-го, в високосный — 29-го
+    (LEAP_BIRTHDAY, date(2023, 2, 27), 1, 364),
+    (LEAP_BIRTHDAY, date(2023, 3, 1), 365, 1),
+    (LEAP_BIRTHDAY, date(2024, 2, 28), 1, 365),
+    (LEAP_BIRTHDAY, date(2024, 3, 1), 364, 1),
+    # Переход через Новый год
+    (date(1990, 1, 1), date(2024, 12, 31), 1, 365),
+    (date(1990, 12, 31), date(2025, 1, 1), 364, 1),
+    (date(1990, 12, 31), date(2024, 1, 1), 365, 1),
+])
+def test_days_until_and_since(birthday, today, until, since):
+    assert days_until_birthday(birthday, today) == until
+    assert days_since_birthday(birthday, today) == since
+
+
+def test_batch_matches_scalar():
+    birthdays = [LEAP_BIRTHDAY, date(1990, 1, 1), date(1990, 12, 31), date(1985, 2, 28), date(1970, 3, 1)]
+    start = date(2023, 1, 1)
+    # Два года подряд: невисокосный 2023 и високосный 2024, включая оба перехода через Новый год
+    for offset in range(2 * 366):
+        today = start + timedelta(days=offset)
+        expected = [days_until_birthday(birthday, today) for birthday in birthdays]
+        assert days_until_birthday_batch(birthdays, today).tolist() == expected, today
+
+
+def test_batch_with_per_user_today():
+    birthdays = [LEAP_BIRTHDAY, date(1990, 12, 31), date(1990, 1, 1)]
+    today = [date(2023, 2, 28), date(2025, 1, 1), date(2024, 12, 31)]
+    assert days_until_birthday_batch(birthdays, today).tolist() == [0, 364, 1]
@@ -0,0 +1,31 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from bot import broadcast
+from bot.broadcast import TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(broadcast, 'time', SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_bucket_refills_from_end_of_pause(clock):
+    bucket = TokenBucket(rate=10)
+    bucket.pause(5)
+    clock[0] = 105.2
+    asyncio.run(bucket.acquire())
+    # За 0.2 с после паузы накопилось 2 токена, один выдан; пауза не засчитывается в пополнение
+    assert bucket.tokens == pytest.approx(1)
+
+
+def test_bucket_refill_capped_by_capacity(clock):
+    bucket = TokenBucket(rate=10, capacity=3)
+    bucket.tokens = 0
+    clock[0] = 200.0
+    asyncio.run(bucket.acquire())
+    assert bucket.tokens == pytest.approx(2)
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from sqlalchemy import inspect, select, text
+
+from bot.db import database
+from bot.db.fsm.models import FSMRecord
+from bot.db.geocache.models import GeoCacheEntry
+from bot.db.leases.models import SchedulerInstance, SchedulerLease
+from bot.db.migrations import MIGRATIONS, get_applied, migrate
+from bot.db.outbox.models import OutboxMessage
+from bot.db.schema.models import SchemaVersion
+from bot.db.users.models import User
+
+# Схема users до миграций: так её создавал create_db() из первой версии бота
+BASELINE_SCHEMA = (
+    'CREATE TABLE users ('
+    ' user_id BIGINT NOT NULL, birthday DATE, timezone VARCHAR(100), city VARCHAR(100),'
+    ' notifications_enabled BOOLEAN, PRIMARY KEY (user_id))',
+    'CREATE INDEX ix_users_user_id ON users (user_id)',
+    "INSERT INTO users (user_id, birthday, timezone, city, notifications_enabled)"
+    " VALUES (1, '2000-02-29', 'Europe/Moscow', 'Москва', NULL)",
+)
+
+MODELS = (User, GeoCacheEntry, FSMRecord, SchedulerLease, SchedulerInstance, OutboxMessage, SchemaVersion)
+TABLES = {'users', 'geocache', 'fsm_states', 'scheduler_leases', 'scheduler_instances', 'outbox', 'schema_migrations'}
+
+
+def get_schema(conn) -> dict:
+    inspector = inspect(conn)
+    return {
+        'tables': set(inspector.get_table_names()),
+        'users_columns': {c['name'] for c in inspector.get_columns('users')},
+        'users_indexes': {i['name']: i['column_names'] for i in inspector.get_indexes('users')},
+    }
+
+
+async def run_migrations(baseline: bool) -> tuple:
+    if baseline:
+        async with database.get_engine().begin() as conn:
+            for statement in BASELINE_SCHEMA:
+                await conn.execute(text(statement))
+    first = await migrate()
+    second = await migrate()
+    async with database.get_engine().connect() as conn:
+        schema = await conn.run_sync(get_schema)
+        users = (await conn.execute(select(User.user_id, User.notifications_enabled))).all()
+    return first, second, schema, set(await get_applied()), users
+
+
+@pytest.mark.parametrize('baseline', [False, True], ids=['fresh', 'baseline'])
+def test_migrate(sqlite_db, baseline):
+    first, second, schema, applied, users = asyncio.run(run_migrations(baseline))
+    versions = [migration.version for migration in MIGRATIONS]
+
+    assert first == versions
+    assert second == []
+    assert applied == set(versions)
+    assert TABLES <= schema['tables']
+    assert {'last_notified_date', 'notifications_enabled'} <= schema['users_columns']
+    assert schema['users_indexes'] == {
+        'ix_users_due': ['notifications_enabled', 'timezone', 'user_id', 'last_notified_date', 'birthday'],
+    }
+    if baseline:
+        # Старые строки с NULL получают включённые уведомления, иначе их не выберет планировщик
+        assert users == [(1, True)]
+
+
+def get_full_schema(conn) -> dict:
+    inspector = inspect(conn)
+    return {
+        table: (
+            {c['name'] for c in inspector.get_columns(table)},
+            {i['name'] for i in inspector.get_indexes(table)},
+        )
+        for table in inspector.get_table_names()
+    }
+
+
+async def migrated_schema() -> dict:
+    await migrate()
+    async with database.get_engine().connect() as conn:
+        return await conn.run_sync(get_full_schema)
+
+
+def test_migrations_match_models(sqlite_db):
+    # Правка модели без новой миграции ломает этот тест: миграции не берут схему из моделей
+    expected = {
+        model.__table__.name: ({c.name for c in model.__table__.columns}, {i.name for i in model.__table__.indexes})
+        for model in MODELS
+    }
+    assert asyncio.run(migrated_schema()) == expected
@@ -0,0 +1,130 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError
+from aiogram.methods import SendMessage
+from sqlalchemy import func, select, update
+
+from bot.broadcast import BroadcastStats
+from bot.db.database import Session
+from bot.db.migrations import migrate
+from bot.db.outbox.models import OutboxMessage
+from bot.db.users.models import User
+from bot.db.users.repository import upsert_user
+from bot.outbox import DEAD, PENDING, SENDING, SENT, OutboxSender, enqueue, retry_delay
+from config import settings
+
+LOCAL_DATE = date(2025, 6, 1)
+METHOD = SendMessage(chat_id=0, text='')
+OK, NETWORK, BLOCKED = 1, 2, 3
+
+
+class FakeBroadcaster:
+    """Вместо Bot API: чаты из errors получают ошибку, остальным сообщение «доставлено»."""
+
+    def __init__(self, errors: dict):
+        self.errors = errors
+        self.sent = []
+
+    async def run(self, messages, **send_kwargs) -> BroadcastStats:
+        stats = BroadcastStats()
+        for chat_id, text in messages:
+            stats.total += 1
+            if chat_id in self.errors:
+                stats.failed += 1
+                stats.errors[chat_id] = self.errors[chat_id]
+            else:
+                stats.sent += 1
+                self.sent.append(chat_id)
+        stats.finished_at = stats.started_at
+        return stats
+
+
+async def get_rows() -> dict:
+    async with Session() as session:
+        rows = (await session.execute(select(OutboxMessage))).scalars().all()
+    return {row.user_id: row for row in rows}
+
+
+async def make_due():
+    async with Session() as session:
+        await session.execute(update(OutboxMessage).values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1)))
+        await session.commit()
+
+
+async def run_lifecycle() -> dict:
+    await migrate()
+    await upsert_user(BLOCKED, timezone='Europe/Moscow', notifications_enabled=True)
+    async with Session() as session:
+        await enqueue(session, [(user_id, LOCAL_DATE, f'text {user_id}') for user_id in (OK, NETWORK, BLOCKED)])
+        # Повторная постановка за ту же дату игнорируется уникальным ключом
+        await enqueue(session, [(OK, LOCAL_DATE, 'duplicate')])
+        await session.commit()
+
+    sender = OutboxSender(bot=None)
+    sender.broadcaster = FakeBroadcaster({
+        NETWORK: TelegramNetworkError(method=METHOD, message='timeout'),
+        BLOCKED: TelegramForbiddenError(method=METHOD, message='Forbidden: bot was blocked by the user'),
+    })
+    result = {}
+    batch = await sender.claim_batch()
+    result['claimed'] = sorted(row.user_id for row in batch)
+    result['claimed_rows'] = await get_rows()
+    # Забранная пачка невидима для других отправителей до дедлайна
+    result['claimed_again'] = await sender.claim_batch()
+    started = datetime.utcnow()
+    await sender.process_batch(batch)
+    result['first'] = await get_rows()
+    result['first_started'] = started
+    # Время повтора ещё не наступило
+    result['before_retry'] = await sender.claim_batch()
+
+    await make_due()
+    batch = await sender.claim_batch()
+    result['retry_claimed'] = [row.user_id for row in batch]
+    await sender.process_batch(batch)
+    result['retry'] = await get_rows()
+
+    async with Session() as session:
+        result['blocked_enabled'] = (await session.execute(
+            select(User.notifications_enabled).where(User.user_id == BLOCKED)
+        )).scalar()
+        result['count'] = (await session.execute(select(func.count()).select_from(OutboxMessage))).scalar()
+    result['sent'] = sender.broadcaster.sent
+    return result
+
+
+def test_claim_sent_retry_dead(sqlite_db, monkeypatch):
+    monkeypatch.setattr(settings, 'outbox_max_attempts', 2)
+    monkeypatch.setattr(settings, 'outbox_retry_base_seconds', 30)
+    result = asyncio.run(run_lifecycle())
+
+    assert result['count'] == 3
+    assert result['claimed'] == [OK, NETWORK, BLOCKED]
+    assert {row.status for row in result['claimed_rows'].values()} == {SENDING}
+    assert result['claimed_again'] == []
+
+    first = result['first']
+    assert first[OK].status == SENT and first[OK].sent_at is not None
+    assert first[OK].payload == f'text {OK}'
+    # Временная ошибка: повтор с экспоненциальной задержкой
+    assert first[NETWORK].status == PENDING and first[NETWORK].attempts == 1
+    assert first[NETWORK].next_attempt_at >= result['first_started'] + retry_delay(1)
+    assert first[NETWORK].last_error.startswith('transient')
+    # Постоянная ошибка: сразу в dead-letter, уведомления пользователю выключаются
+    assert first[BLOCKED].status == DEAD and first[BLOCKED].last_error.startswith('forbidden')
+    assert result['blocked_enabled'] is False
+    assert result['before_retry'] == []
+
+    # Вторая неудача исчерпывает outbox_max_attempts
+    assert result['retry_claimed'] == [NETWORK]
+    assert result['retry'][NETWORK].status == DEAD and result['retry'][NETWORK].attempts == 2
+    assert result['retry'][OK].status == SENT
+    assert result['sent'] == [OK]
+
+
+@pytest.mark.parametrize('attempts, seconds', [(1, 30), (2, 60), (3, 120), (4, 240)])
+def test_retry_delay_is_exponential(monkeypatch, attempts, seconds):
+    monkeypatch.setattr(settings, 'outbox_retry_base_seconds', 30)
+    assert retry_delay(attempts) == timedelta(seconds=seconds)
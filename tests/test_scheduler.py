@@ -0,0 +1,36 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+import pytz
+
+from bot.scheduler import get_due_timezones
+from config import settings
+
+
+def due_dates(zone: str, local_date: date) -> dict:
+    """Локальная дата -> окна (UTC), в которых зона считалась пришедшей, с 22:00 накануне до 03:00 local_date."""
+    start = pytz.timezone(zone).localize(datetime.combine(local_date, datetime.min.time()) - timedelta(hours=2))
+    start = start.astimezone(pytz.utc)
+    result = {}
+    for step in range(0, 5 * 60, settings.notify_interval_minutes):
+        window_start = start + timedelta(minutes=step)
+        for due_date, zones in get_due_timezones(window_start).items():
+            if zone in zones:
+                result.setdefault(due_date, []).append(window_start)
+    return result
+
+
+@pytest.mark.parametrize('zone, local_date', [
+    # Переход на летнее время пропускает полночь: 00:00 -> 01:00
+    ('Asia/Beirut', date(2025, 3, 30)),
+    ('America/Havana', date(2025, 3, 9)),
+    ('America/Santiago', date(2025, 9, 7)),
+])
+def test_zone_due_when_dst_skips_midnight(zone, local_date):
+    assert local_date in due_dates(zone, local_date)
+
+
+def test_zone_due_only_in_first_window_after_midnight():
+    windows = due_dates('Europe/Moscow', date(2025, 6, 1))[date(2025, 6, 1)]
+    assert windows[0] == datetime(2025, 5, 31, 21, 0, tzinfo=pytz.utc)
+    assert len(windows) == settings.notify_window_minutes // settings.notify_interval_minutes
@@ -0,0 +1,70 @@
+import asyncio
+import math
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from bot.db.database import Session
+from bot.db.leases.models import SchedulerInstance, SchedulerLease
+from bot.db.migrations import migrate
+from bot.sharding import LeaseManager
+
+PARTITIONS = 10
+TTL = timedelta(seconds=90)
+
+
+async def converge(managers: list, rounds: int = 3):
+    # Лишние партиции отдаются на одном heartbeat, а забираются на следующем
+    for _ in range(rounds):
+        for manager in managers:
+            await manager.heartbeat()
+
+
+async def live_owners() -> dict:
+    """Партиция -> владелец с действующей арендой."""
+    async with Session() as session:
+        rows = (await session.execute(
+            select(SchedulerLease.partition, SchedulerLease.owner)
+            .where(SchedulerLease.owner != None, SchedulerLease.expires_at > datetime.utcnow())
+        )).all()
+    return dict(rows)
+
+
+async def expire(owner: str):
+    """Инстанс перестал продлевать аренду, и её срок прошёл."""
+    past = datetime.utcnow() - timedelta(seconds=1)
+    async with Session() as session:
+        await session.execute(update(SchedulerLease).where(SchedulerLease.owner == owner).values(expires_at=past))
+        await session.execute(update(SchedulerInstance).where(SchedulerInstance.owner == owner).values(expires_at=past))
+        await session.commit()
+
+
+def assert_balanced(owners: dict, owned: dict):
+    share = math.ceil(PARTITIONS / len(owned))
+    # Каждая партиция у ровно одного живого инстанса, и никто не держит больше честной доли
+    assert set(owners) == set(range(PARTITIONS))
+    assert set(owners.values()) <= set(owned)
+    for name, partitions in owned.items():
+        held = {p for p, owner in owners.items() if owner == name}
+        assert len(held) <= share
+        assert partitions == held
+
+
+async def run_scenario() -> list:
+    await migrate()
+    a, b, c = (LeaseManager(PARTITIONS, TTL, name) for name in 'abc')
+    snapshots = []
+    for managers in ([a], [a, b], [a, b, c]):
+        await converge(managers)
+        snapshots.append((await live_owners(), {m.owner: m.owned for m in managers}))
+    await expire(b.owner)
+    await converge([a, c])
+    snapshots.append((await live_owners(), {m.owner: m.owned for m in (a, c)}))
+    return snapshots
+
+
+def test_lease_rebalancing(sqlite_db):
+    snapshots = asyncio.run(run_scenario())
+    for owners, owned in snapshots:
+        assert_balanced(owners, owned)
+    assert [sorted(owned) for _, owned in snapshots] == [['a'], ['a', 'b'], ['a', 'b', 'c'], ['a', 'c']]
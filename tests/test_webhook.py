@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot.webhook import SECRET_HEADER, check_webhook_settings, create_app
+from config import settings
+
+SECRET = 'test-secret'
+UPDATE = {
+    'update_id': 1,
+    'message': {
+        'message_id': 1, 'date': 0, 'text': '/menu',
+        'chat': {'id': 42, 'type': 'private'}, 'from': {'id': 42, 'is_bot': False, 'first_name': 'Test'},
+    },
+}
+
+
+@pytest.fixture(autouse=True)
+def webhook_settings(monkeypatch):
+    monkeypatch.setattr(settings, 'webhook_url', 'https://bot.example.com')
+    monkeypatch.setattr(settings, 'webhook_secret', SECRET)
+
+
+async def post(headers: dict, **kwargs) -> tuple:
+    """Статус ответа и апдейты, дошедшие до хендлера."""
+    received = []
+    router = Router()
+
+    @router.message()
+    async def handler(message: Message):
+        received.append(message.text)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot('123456:test')
+    async with TestClient(TestServer(create_app(dp, bot))) as client:
+        response = await client.post(settings.webhook_path, headers=headers, **kwargs)
+        # Апдейт обрабатывается в фоне после ответа
+        for _ in range(100):
+            if received:
+                break
+            await asyncio.sleep(0.01)
+    await bot.session.close()
+    return response.status, received
+
+
+def test_valid_update_is_dispatched():
+    assert asyncio.run(post({SECRET_HEADER: SECRET}, json=UPDATE)) == (200, ['/menu'])
+
+
+@pytest.mark.parametrize('headers', [{}, {SECRET_HEADER: 'wrong'}, {SECRET_HEADER: 'секрет'}])
+def test_bad_secret_rejected(headers):
+    assert asyncio.run(post(headers, json=UPDATE)) == (401, [])
+
+
+def test_bad_json_rejected():
+    assert asyncio.run(post({SECRET_HEADER: SECRET}, data='{not json')) == (400, [])
+
+
+@pytest.mark.parametrize('name', ['webhook_url', 'webhook_secret'])
+def test_refuses_to_start_without_settings(monkeypatch, name):
+    monkeypatch.setattr(settings, name, None)
+    with pytest.raises(RuntimeError, match=name.upper()):
+        check_webhook_settings()